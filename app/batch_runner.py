@@ -0,0 +1,267 @@
+# app/batch_runner.py
+#
+# Headless-прогон LotAnalyzer по каталогу лотов или JSONL-манифесту.
+# Примеры (из каталога app/):
+#   python batch_runner.py --lots-dir data/local_lots --output data/results/scores.jsonl
+#   python batch_runner.py --manifest lots.jsonl --output data/results/scores.parquet --batch-size 32
+#
+# Лоты читаются потоково, изображения декодируются пулом потоков с ограниченной
+# глубиной предвыборки, результаты пишутся по мере готовности пакетов.
+# Рядом с выходным файлом ведётся чекпоинт <output>.done: при перезапуске
+# уже обработанные lot_id пропускаются.
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.analyzer import LotAnalyzer
+from modules.backends import BACKENDS
+from modules.data_loader import iter_local_lots, iter_manifest
+from modules.metrics import METRICS
+from modules.preprocess import load_image
+from modules.result_cache import ResultCache
+from modules.worker_pool import ProcessLotAnalyzer
+
+logger = logging.getLogger("batch_runner")
+
+
+def _decode(lot: dict):
+    return load_image(lot["image_path"])
+
+
+def prefetch_images(lots, workers: int, depth: int):
+    """
+    Декодирует изображения в пуле потоков, сохраняя порядок лотов.
+    В работе одновременно не больше depth изображений — память ограничена.
+    Отдаёт (lot, image, error).
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as pool:
+        pending = deque()
+        for lot in lots:
+            pending.append((lot, pool.submit(_decode, lot)))
+            if len(pending) >= depth:
+                yield _resolve(*pending.popleft())
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(lot: dict, future):
+    try:
+        return lot, future.result(), None
+    except Exception as e:
+        return lot, None, f"{type(e).__name__}: {e}"
+
+
+def batched(items, batch_size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """Список завершённых lot_id, дописывается после каждого записанного пакета."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def mark(self, lot_ids: list):
+        self._file.write("".join(f"{lot_id}\n" for lot_id in lot_ids))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records: list):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Parquet не дописывается, поэтому каждый запуск создаёт новый файл-часть
+    в каталоге <output>/; каждый пакет — отдельная row group.
+    """
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        os.makedirs(path, exist_ok=True)
+        part = len([name for name in os.listdir(path) if name.endswith(".parquet")])
+        self._schema = pa.schema([
+            ("lot_id", pa.string()),
+            ("risk_level", pa.string()),
+            ("category", pa.string()),
+            ("category_source", pa.string()),
+            ("similarity_score", pa.float64()),
+            ("ai_score", pa.float64()),
+            ("is_ai_generated", pa.bool_()),
+            ("has_forbidden", pa.bool_()),
+            ("detected_objects", pa.list_(pa.string())),
+            ("duplicate_cluster", pa.string()),
+            ("duplicate_cluster_size", pa.int64()),
+            ("details", pa.string()),
+            ("error", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(os.path.join(path, f"part-{part:05d}.parquet"), self._schema)
+
+    def write(self, records: list):
+        rows = []
+        for record in records:
+            ai = record.get("ai_detection") or {}
+            duplicates = record.get("duplicate_images") or {}
+            rows.append({
+                "lot_id": record["lot_id"],
+                "risk_level": record.get("risk_level"),
+                "category": record.get("category"),
+                "category_source": record.get("category_source"),
+                "similarity_score": record.get("similarity_score"),
+                "ai_score": ai.get("ai_score"),
+                "is_ai_generated": ai.get("is_ai_generated"),
+                "has_forbidden": record.get("has_forbidden"),
+                "detected_objects": record.get("detected_objects"),
+                "duplicate_cluster": duplicates.get("cluster_id"),
+                "duplicate_cluster_size": duplicates.get("cluster_size"),
+                # Вложенные поля (RAG-контекст, детекции, совпадения фото, тайминги) — одной JSON-строкой
+                "details": json.dumps(
+                    {
+                        key: record[key]
+                        for key in ("rag_context", "detections", "duplicate_images", "cascade", "timings")
+                        if key in record
+                    },
+                    ensure_ascii=False
+                ),
+                "error": record.get("error"),
+            })
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def make_writer(path: str):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path)
+    return JsonlWriter(path)
+
+
+def run(analyzer: LotAnalyzer, lots, output: str, batch_size: int = 16, workers: int = 4):
+    """Прогоняет поток лотов через analyzer.analyze_lots с записью результатов и чекпоинтом."""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    checkpoint = Checkpoint(output.rstrip("/") + ".done")
+    writer = make_writer(output)
+    todo = (lot for lot in lots if lot["lot_id"] not in checkpoint.done)
+    if checkpoint.done:
+        logger.info("Resuming: %d lots already done", len(checkpoint.done))
+
+    processed, start = 0, time.perf_counter()
+    try:
+        decoded = prefetch_images(todo, workers=workers, depth=batch_size * 2)
+        for batch in batched(decoded, batch_size):
+            ok = [(image, lot["text"], lot["lot_id"]) for lot, image, error in batch if error is None]
+            records = [result.to_dict() for result in analyzer.analyze_lots(ok)]
+            records += [
+                {"lot_id": lot["lot_id"], "error": error}
+                for lot, image, error in batch if error is not None
+            ]
+            writer.write(records)
+            checkpoint.mark([record["lot_id"] for record in records])
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - start
+            logger.info("%d lots, %.1f lots/sec", processed, processed / elapsed)
+    finally:
+        writer.close()
+        checkpoint.close()
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch scoring of marketplace lots")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--lots-dir", help="каталог с подкаталогами lot_XXX/")
+    source.add_argument("--manifest", help="JSONL: lot_id, image, text | text_path")
+    parser.add_argument("--output", required=True, help="*.jsonl или *.parquet")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4, help="потоков декодирования")
+    parser.add_argument("--persist-dir", default="./data/chroma_db")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать ResultCache")
+    parser.add_argument("--parallel-stages", action="store_true")
+    parser.add_argument("--metrics-file", help="записать метрики в формате Prometheus (textfile collector)")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--model-workers", type=int, default=0,
+                        help="процессов с моделями (0 — инференс в этом процессе)")
+    parser.add_argument("--torch-threads", type=int, help="потоков torch на процесс-воркер")
+    parser.add_argument("--cascade", action="store_true",
+                        help="каскад стадий: лоты с однозначно высоким риском не проходят оставшиеся модели")
+    args = parser.parse_args()
+    if args.cascade and args.model_workers:
+        parser.error("--cascade is not supported with --model-workers")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.model_workers:
+        analyzer = ProcessLotAnalyzer(
+            workers=args.model_workers,
+            torch_threads=args.torch_threads,
+            persist_dir=args.persist_dir,
+            backend=args.backend,
+            cascade=args.cascade
+        )
+        analyzer.start()
+    else:
+        analyzer = LotAnalyzer(
+            persist_dir=args.persist_dir,
+            parallel_stages=args.parallel_stages,
+            backend=args.backend,
+            cascade=args.cascade
+        )
+    if not args.no_cache:
+        analyzer.result_cache = ResultCache(model_version=analyzer.model_version)
+    lots = iter_local_lots(args.lots_dir) if args.lots_dir else iter_manifest(args.manifest)
+    try:
+        processed = run(analyzer, lots, args.output, batch_size=args.batch_size, workers=args.workers)
+    finally:
+        if args.model_workers:
+            analyzer.close()
+    if args.cascade:
+        # Отложенная запись лотов с вердиктом каскада в базу должна завершиться до выхода
+        analyzer.flush_enrichment()
+        logger.info("Cascade: %s", json.dumps(analyzer.cascade_report(), ensure_ascii=False))
+    if not args.no_cache:
+        # Последние отметки использования кэша — на диск, иначе LRU их не учтёт
+        analyzer.result_cache.flush()
+    logger.info("Done: %d lots", processed)
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            f.write(METRICS.to_prometheus())
+    METRICS.log_json(logger)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# app/benchmarks/backends.py
+#
+# Паритет и пропускная способность бэкендов инференса относительно torch fp32.
+# Запуск из каталога app/:
+#   python -m benchmarks.backends --lots-dir data/local_lots --batch-size 8
+#
+# Конфигурация задаётся как модель=бэкенд, например
+#   --configs yolo=onnx,ai_detector=int8,clip=int8 yolo=int8,ai_detector=onnx,clip=int8
+
+import argparse
+import tempfile
+import time
+
+from modules.analyzer import LotAnalyzer
+from modules.backends import check_parity
+from benchmarks.batch_throughput import load_corpus
+
+DEFAULT_CONFIGS = [
+    "yolo=onnx,ai_detector=onnx,clip=torch",
+    "yolo=int8,ai_detector=int8,clip=int8",
+    "yolo=onnx,ai_detector=int8,clip=int8",
+]
+
+
+def parse_config(config: str) -> dict:
+    return dict(part.split("=", 1) for part in config.split(","))
+
+
+def throughput(analyzer: LotAnalyzer, samples: list, batch_size: int, repeats: int) -> float:
+    """Лотов в секунду на модельных стадиях (без кэша и векторной базы)."""
+    batch = [samples[i % len(samples)] for i in range(batch_size)]
+    images = [image for image, _ in batch]
+    texts = [text for _, text in batch]
+    analyzer.infer(images, texts)  # прогрев
+    start = time.perf_counter()
+    for _ in range(repeats):
+        analyzer.infer(images, texts)
+    return batch_size * repeats / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and throughput of inference backends")
+    parser.add_argument("--lots-dir", default="data/local_lots")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = load_corpus(args.lots_dir)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        reference = LotAnalyzer(persist_dir=persist_dir, backend="torch")
+        baseline = throughput(reference, samples, args.batch_size, args.repeats)
+        print(f"{'torch':<45} {baseline:>8.2f} lots/sec  (reference)")
+
+        best = ("torch", baseline)
+        for config in args.configs:
+            try:
+                candidate = LotAnalyzer(persist_dir=persist_dir, backend=parse_config(config))
+                parity = check_parity(reference, candidate, samples)
+                lps = throughput(candidate, samples, args.batch_size, args.repeats)
+            except Exception as e:
+                print(f"{config:<45} unavailable: {e}")
+                continue
+            status = "ok" if parity["passed"] else "OUT OF TOLERANCE"
+            print(f"{config:<45} {lps:>8.2f} lots/sec  x{lps / baseline:.2f}  {status}  "
+                  f"classes±{parity['class_mismatches']} ai±{parity['max_ai_score_diff']} "
+                  f"sim±{parity['max_similarity_diff']}")
+            if parity["passed"] and lps > best[1]:
+                best = (config, lps)
+
+    print(f"\nFastest backend within tolerance: {best[0]} ({best[1]:.2f} lots/sec)")
+
+
+if __name__ == "__main__":
+    main()
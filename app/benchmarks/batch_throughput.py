@@ -0,0 +1,69 @@
+# app/benchmarks/batch_throughput.py
+#
+# Замер пропускной способности LotAnalyzer.analyze_lots в зависимости от размера батча.
+# Запуск из каталога app/:
+#   python -m benchmarks.batch_throughput --lots-dir data/local_lots --batch-sizes 1 4 8 16
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from modules.analyzer import LotAnalyzer
+from modules.data_loader import load_local_data
+
+
+def load_corpus(lots_dir: str) -> list:
+    """Загружает все пары (image, text) из каталогов lot_XXX."""
+    corpus = []
+    for name in sorted(os.listdir(lots_dir)):
+        lot_dir = os.path.join(lots_dir, name)
+        if not os.path.isdir(lot_dir):
+            continue
+        corpus.append(load_local_data(
+            os.path.join(lot_dir, "image.jpg"),
+            os.path.join(lot_dir, "description.txt"),
+        ))
+    if not corpus:
+        raise FileNotFoundError(f"No lots found in {lots_dir}")
+    return corpus
+
+
+def run(analyzer: LotAnalyzer, corpus: list, batch_size: int, total: int) -> float:
+    """Прогоняет total лотов батчами по batch_size, возвращает лотов в секунду."""
+    run_id = uuid.uuid4().hex[:8]
+    lots = [
+        (corpus[i % len(corpus)][0], corpus[i % len(corpus)][1], f"bench_{run_id}_{i}")
+        for i in range(total)
+    ]
+    start = time.perf_counter()
+    for i in range(0, total, batch_size):
+        analyzer.analyze_lots(lots[i:i + batch_size])
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lots/sec vs batch size for LotAnalyzer.analyze_lots")
+    parser.add_argument("--lots-dir", default="data/local_lots")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--total", type=int, default=64, help="лотов на каждый замер")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.lots_dir)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        # Отдельная база, чтобы не засорять data/chroma_db тестовыми лотами
+        analyzer = LotAnalyzer(persist_dir=persist_dir)
+        # Прогрев: первая итерация включает инициализацию CUDA/ленивые загрузки
+        run(analyzer, corpus, batch_size=1, total=2)
+
+        print(f"{'batch':>6} {'lots/sec':>10} {'speedup':>8}")
+        baseline = None
+        for batch_size in args.batch_sizes:
+            lps = run(analyzer, corpus, batch_size, args.total)
+            baseline = baseline or lps
+            print(f"{batch_size:>6} {lps:>10.2f} {lps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# app/benchmarks/cascade.py
+#
+# Каскад стадий LotAnalyzer против полного прогона на одном и том же трафике:
+# как часто каждая стадия пропускается и насколько снижается средняя задержка лота.
+# Трафик — синтетический корпус (benchmarks/standins.py) с заданной долей лотов
+# с запрещёнными объектами, либо реальные лоты из --lots-dir.
+# Запуск из каталога app/:
+#   python -m benchmarks.cascade --lots 500 --forbidden-rate 0.3
+#   python -m benchmarks.cascade --models real --lots-dir data/local_lots --lots 100
+#   python -m benchmarks.cascade --models real --order ai_detector yolo clip
+#
+# С заменителями моделей (по умолчанию) доли пропусков те же, что у настоящих
+# моделей на таком же трафике, а выигрыш по времени — нет: он появляется с --models real.
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from benchmarks.standins import SyntheticCorpus
+from benchmarks.suite import make_analyzer
+
+
+def traffic(args) -> list:
+    if args.lots_dir:
+        from benchmarks.batch_throughput import load_corpus
+        corpus = load_corpus(args.lots_dir)
+        return [(*corpus[i % len(corpus)], f"cascade_{i}") for i in range(args.lots)]
+    width, height = map(int, args.image_size.split("x"))
+    corpus = SyntheticCorpus(seed=args.seed, image_size=(width, height), forbidden_rate=args.forbidden_rate,
+                             duplicate_rate=args.duplicate_rate)
+    return list(corpus.lots(0, args.lots))
+
+
+def run(lots: list, args, cascade: bool):
+    """Прогоняет lots по одному (как запросы интерфейса). Возвращает (задержки мс, анализатор)."""
+    with tempfile.TemporaryDirectory() as persist_dir:
+        analyzer = make_analyzer(args.models, persist_dir, cascade=cascade, cascade_order=args.order)
+        analyzer.warm_up()
+        latencies = []
+        for image, text, lot_id in lots:
+            start = time.perf_counter()
+            analyzer.analyze_lot(image, text, lot_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if cascade:
+            analyzer.flush_enrichment()
+        return latencies, analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade mode: stage skip rates and latency reduction")
+    parser.add_argument("--lots", type=int, default=300)
+    parser.add_argument("--lots-dir", help="реальные лоты вместо синтетического корпуса")
+    parser.add_argument("--models", choices=["standins", "real"], default="standins")
+    parser.add_argument("--order", nargs="+", choices=["yolo", "ai_detector", "clip"],
+                        help="фиксированный порядок стадий (по умолчанию — по измеренной стоимости)")
+    parser.add_argument("--forbidden-rate", type=float, default=0.2)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--image-size", default="640x480")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    lots = traffic(args)
+    full, _ = run(lots, args, cascade=False)
+    cascaded, analyzer = run(lots, args, cascade=True)
+    report = analyzer.cascade_report()
+
+    print(f"lots={len(lots)} models={args.models}")
+    print("decided by: " + ", ".join(f"{name}={share:.1%}" for name, share in report["decided"].items()))
+    print("skipped:    " + ", ".join(f"{name}={share:.1%}" for name, share in report["skipped"].items()))
+    print("stage cost: " + ", ".join(f"{name}={ms:.1f} ms" for name, ms in report["stage_cost_ms"].items()))
+    print(f"models/lot: {report['avg_models_ms']:.1f} ms with cascade, "
+          f"{report['avg_models_ms_without_cascade']:.1f} ms estimated without "
+          f"({report['latency_reduction']:.1%} less)")
+    print(f"analyze_lot mean: {statistics.mean(full):.1f} ms full, {statistics.mean(cascaded):.1f} ms cascade "
+          f"({1 - statistics.mean(cascaded) / statistics.mean(full):.1%} less); "
+          f"p50 {statistics.median(full):.1f} -> {statistics.median(cascaded):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# app/benchmarks/encoder_sharing.py
+#
+# Сколько памяти и времени экономит общий ClipEncoder.
+# Запуск из каталога app/:
+#   python -m benchmarks.encoder_sharing
+
+import argparse
+import os
+import time
+
+from modules.encoder import ClipEncoder
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса (Linux, /proc)."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory/latency saved by sharing one CLIP encoder")
+    parser.add_argument("--text", default="Шлепанцы TapOKey, размер 42, новые")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    before = rss_mb()
+    start = time.perf_counter()
+    encoder = ClipEncoder()
+    load_s = time.perf_counter() - start
+    loaded = rss_mb()
+    print(f"CLIP copy: +{loaded - before:.0f} MB RSS, cold load {load_s:.2f} s "
+          f"(saved once per worker by sharing)")
+
+    encoder.encode_text(args.text)  # прогрев
+
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        encoder.encode_text(args.text)
+    miss_ms = (time.perf_counter() - start) / args.repeats * 1000
+
+    with encoder.request_scope():
+        encoder.encode_text(args.text)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            encoder.encode_text(args.text)
+        hit_ms = (time.perf_counter() - start) / args.repeats * 1000
+
+    print(f"text encode: {miss_ms:.2f} ms uncached, {hit_ms:.3f} ms from request cache "
+          f"(saved per repeated string)")
+
+
+if __name__ == "__main__":
+    main()
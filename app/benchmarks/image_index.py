@@ -0,0 +1,68 @@
+# app/benchmarks/image_index.py
+#
+# Задержка поиска почти-дубликатов в ImageIndex при растущем размере индекса.
+# Эмбеддинги синтетические (размерность CLIP), часть запросов — зашумлённые
+# копии уже вставленных фото, чтобы проверить и скорость, и находимость.
+# Запуск из каталога app/:
+#   python -m benchmarks.image_index --sizes 10000 100000 1000000 --queries 200
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from modules.image_index import ImageIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate lookup latency vs index size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="шум дубликата относительно нормы 1")
+    parser.add_argument("--insert-batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    import chromadb
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'insert/s':>9} {'p50 ms':>7} {'p99 ms':>7} {'found':>6}")
+    with tempfile.TemporaryDirectory() as persist_dir:
+        client = chromadb.PersistentClient(path=persist_dir)
+        index = ImageIndex(client, collection_name="bench_images")
+        total = 0
+        # Выборка вставленных векторов для запросов: весь индекс в памяти не держим
+        probe_ids, probes = [], []
+        for size in args.sizes:
+            # Инкрементальная догрузка до нужного размера
+            start, before = time.perf_counter(), total
+            while total < size:
+                batch = rng.standard_normal((min(args.insert_batch, size - total), args.dim))
+                batch = (batch / np.linalg.norm(batch, axis=1, keepdims=True)).astype(np.float32)
+                ids = [f"img_{total + i}" for i in range(len(batch))]
+                index.add(ids, batch, ["0" * 16] * len(ids))
+                for row in rng.choice(len(batch), min(len(batch), args.queries), replace=False):
+                    probe_ids.append(ids[row])
+                    probes.append(batch[row])
+                total += len(batch)
+            insert_rate = (total - before) / (time.perf_counter() - start)
+
+            picks = rng.choice(len(probes), args.queries, replace=False)
+            latencies, found = [], 0
+            for pick in picks:
+                noise = args.noise * rng.standard_normal(args.dim) / np.sqrt(args.dim)
+                query = (probes[pick] + noise).astype(np.float32)
+                start = time.perf_counter()
+                candidates = index.nearest(query[None, :])[0]
+                latencies.append((time.perf_counter() - start) * 1000)
+                found += any(
+                    lot_id == probe_ids[pick] and sim >= index.threshold for lot_id, sim, _ in candidates
+                )
+
+            print(f"{size:>9} {insert_rate:>9.0f} {np.percentile(latencies, 50):>7.2f} "
+                  f"{np.percentile(latencies, 99):>7.2f} {found / args.queries:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# app/benchmarks/llm_latency.py
+#
+# Время до первого токена и полное время отчёта RAGLLM против заглушки Ollama,
+# а также пропускная способность пакетной генерации.
+#   python -m benchmarks.llm_latency --reports 16 --concurrency 1 2 4
+
+import argparse
+import time
+
+from modules.rag_llm import RAGLLM
+from benchmarks.stub_ollama import start_stub_server
+
+SAMPLE_ANALYSIS = {
+    "lot_id": "bench",
+    "detected_objects": ["person", "cell phone"],
+    "similarity_score": 0.27,
+    "ai_detection": {"is_ai_generated": False, "ai_score": 0.12},
+    "risk_level": "средний",
+    "rag_context": [{"description": "Описание: Смартфон. Уровень риска: высокий", "risk_level": "высокий"}],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAGLLM latency against a local stub Ollama")
+    parser.add_argument("--reports", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(tokens=args.tokens, token_delay_ms=args.token_delay_ms)
+    try:
+        for concurrency in args.concurrency:
+            llm = RAGLLM(ollama_url=url, max_concurrency=concurrency)
+            items = [(SAMPLE_ANALYSIS, "Смартфон")] * args.reports
+            start = time.perf_counter()
+            llm.generate_reports(items)
+            elapsed = time.perf_counter() - start
+            stats = llm.latency_stats()
+            print(f"concurrency={concurrency}: {args.reports / elapsed:.2f} reports/sec, "
+                  f"ttft p50={stats['ttft_p50_ms']:.0f} ms, total p50={stats['total_p50_ms']:.0f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# app/benchmarks/load_harness.py
+#
+# Нагрузочный тест HTTP-сервиса (service.py): N параллельных клиентов шлют /analyze.
+# Запуск (сервис уже поднят):
+#   python -m benchmarks.load_harness --url http://127.0.0.1:8080 --concurrency 64 --requests 2000
+#
+# Тексты различаются, чтобы запросы не обслуживались целиком из ResultCache;
+# с --unique-images изображения тоже слегка меняются (сдвиг одного пикселя).
+
+import argparse
+import asyncio
+import base64
+import io
+import statistics
+import time
+
+import aiohttp
+from PIL import Image
+
+from benchmarks.batch_throughput import load_corpus
+
+
+def encode_image(image: Image.Image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def make_payloads(corpus: list, count: int, unique_images: bool) -> list:
+    payloads = []
+    base = [encode_image(image) for image, _ in corpus]
+    for i in range(count):
+        image, text = corpus[i % len(corpus)]
+        if unique_images:
+            image = image.copy()
+            image.putpixel((0, 0), (i % 256, (i // 256) % 256, 0))
+            image_b64 = encode_image(image)
+        else:
+            image_b64 = base[i % len(corpus)]
+        payloads.append({"text": f"{text} #{i}", "image_b64": image_b64, "lot_id": f"load_{i}"})
+    return payloads
+
+
+async def worker(session, url: str, queue: asyncio.Queue, latencies: list, statuses: dict):
+    while True:
+        try:
+            payload = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            async with session.post(url, json=payload) as response:
+                await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            status = "connection_error"
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(url: str, payloads: list, concurrency: int):
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, statuses = [], {}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            worker(session, url + "/analyze", queue, latencies, statuses) for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the lot analysis HTTP service")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--lots-dir", default="data/local_lots")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--unique-images", action="store_true")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.lots_dir)
+    for concurrency in args.concurrency:
+        payloads = make_payloads(corpus, args.requests, args.unique_images)
+        latencies, statuses, elapsed = asyncio.run(run(args.url, payloads, concurrency))
+        ok = statuses.get(200, 0)
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+            summary = f"p50={statistics.median(latencies):.0f} ms p99={p99:.0f} ms"
+        else:
+            summary = "no successful requests"
+        print(f"concurrency={concurrency:>4}: {ok / elapsed:7.1f} req/sec, {summary}, statuses={statuses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# app/benchmarks/preprocess.py
+#
+# Время декодирования и пиковый RSS: полный Image.open(...).convert("RGB")
+# против preprocess.load_image (draft-режим JPEG + ограничение размера).
+# Запуск из каталога app/:
+#   python -m benchmarks.preprocess --sizes 3840x2160 6000x4000
+#
+# Каждый вариант выполняется в отдельном процессе, чтобы пик RSS
+# одного замера не маскировал другой.
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from PIL import Image
+
+from modules.preprocess import classifier_view, load_image
+
+
+def make_photo(path: str, width: int, height: int):
+    """Синтетическое «фото»: градиент с шумом, чтобы JPEG не сжимался в ничто."""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT))).save(path, quality=90)
+
+
+def _full_decode(path: str):
+    image = Image.open(path).convert("RGB")
+    return image, image.resize((224, 224))
+
+
+def _shared_decode(path: str):
+    image = load_image(path)
+    return image, classifier_view(image)
+
+
+def _measure(args) -> tuple:
+    variant, path, repeats = args
+    fn = _full_decode if variant == "full" else _shared_decode
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(repeats):
+        image, _ = fn(path)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed_ms, (peak_kb - base_kb) / 1024, image.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode time and peak RSS: full decode vs load_image")
+    parser.add_argument("--sizes", nargs="+", default=["3840x2160", "6000x4000", "8000x6000"])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'photo':>10} {'variant':>7} {'decoded':>10} {'ms':>8} {'peak +MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            width, height = map(int, size.split("x"))
+            path = os.path.join(tmp, f"{size}.jpg")
+            make_photo(path, width, height)
+            for variant in ("full", "shared"):
+                with ctx.Pool(1) as pool:
+                    ms, peak_mb, decoded = pool.apply(_measure, ((variant, path, args.repeats),))
+                print(f"{size:>10} {variant:>7} {'x'.join(map(str, decoded)):>10} {ms:>8.1f} {peak_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
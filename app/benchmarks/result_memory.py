@@ -0,0 +1,149 @@
+# app/benchmarks/result_memory.py
+#
+# Память на один результат анализа в больших пакетах:
+#   dict+yolo — прежний словарь с объектом ultralytics Results (тензоры, orig_img);
+#   dict      — тот же словарь без yolo_results, детекции списком словарей;
+#   LotResult — modules/result.py (массивы float32/int16 и поля вердикта).
+# Запуск из каталога app/:
+#   python -m benchmarks.result_memory --lots 10000 --detections 5
+#   python -m benchmarks.result_memory --lots 2000 --image-size 1280x960
+#
+# Каждый вариант строится в отдельном процессе; прирост RSS делится на число
+# результатов. Для вариантов без тензоров torch дополнительно приводится
+# tracemalloc (Python-объекты и буферы numpy). Заодно — размер сериализации.
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from modules.result import LotResult
+
+NAMES = {0: "person", 1: "cell phone", 2: "laptop", 3: "handbag", 4: "bottle"}
+
+
+def rss_bytes() -> int:
+    """Текущий (не пиковый) RSS процесса."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def fake_fields(i: int, rng, timings: dict) -> dict:
+    return {
+        "lot_id": f"lot_{i}",
+        "similarity_score": round(float(rng.random()), 3),
+        "ai_detection": {"is_ai_generated": False, "ai_score": 0.12, "explanation": "Изображение выглядит реальным"},
+        "risk_level": "низкий",
+        "rag_context": [
+            {"description": f"Описание: похожий лот {i}. Объекты: cell phone.", "risk_level": "средний",
+             "recommendation": "Проверьте историю продавца"},
+        ],
+        "from_cache": False,
+        "category": "телефоны",
+        "category_source": "keywords",
+        "zero_shot": None,
+        "has_forbidden": False,
+        "duplicate_images": None,
+        "forbidden_objects": [],
+        "timings": timings,
+    }
+
+
+def fake_detections(rng, n: int, width: int, height: int) -> list:
+    detections = []
+    for _ in range(n):
+        x1, y1 = rng.random() * width / 2, rng.random() * height / 2
+        cls = int(rng.integers(0, len(NAMES)))
+        detections.append({
+            "label": NAMES[cls],
+            "box": [round(x1, 1), round(y1, 1), round(x1 + width / 4, 1), round(y1 + height / 4, 1)],
+            "score": round(float(rng.random()), 3),
+            "class_id": cls,
+        })
+    return detections
+
+
+def yolo_result(detections: list, width: int, height: int):
+    """Объект ultralytics Results, как его возвращал YOLO: orig_img и тензор рамок."""
+    import torch
+    from ultralytics.engine.results import Results
+
+    data = torch.tensor(
+        [det["box"] + [det["score"], det["class_id"]] for det in detections], dtype=torch.float32
+    ).reshape(-1, 6)
+    orig_img = np.zeros((height, width, 3), dtype=np.uint8)
+    result = Results(orig_img, path="image0.jpg", names=NAMES, boxes=data)
+    result.speed = {"preprocess": 1.0, "inference": 20.0, "postprocess": 1.0}
+    return result
+
+
+def build(variant: str, args, queue):
+    width, height = map(int, args.image_size.split("x"))
+    rng = np.random.default_rng(0)
+    timings = {"yolo": 20.0, "ai_detector": 15.0, "clip": 10.0, "total": 50.0}
+    inputs = [(fake_detections(rng, args.detections, width, height), fake_fields(i, rng, timings))
+              for i in range(args.lots)]
+    if variant == "dict+yolo":
+        import torch  # noqa: F401  — импорт torch не должен попасть в прирост RSS
+
+    trace = variant != "dict+yolo"
+    if trace:
+        tracemalloc.start()
+    before = rss_bytes()
+    results = []
+    for detections, fields in inputs:
+        if variant == "LotResult":
+            results.append(LotResult.from_detections(detections, **fields))
+        else:
+            record = dict(fields, detections=detections, detected_objects=[d["label"] for d in detections])
+            if variant == "dict+yolo":
+                record["yolo_results"] = [yolo_result(detections, width, height)]
+            results.append(record)
+    rss = (rss_bytes() - before) / args.lots
+    traced = tracemalloc.get_traced_memory()[0] / args.lots if trace else None
+
+    json_size = binary_size = round_trip_us = None
+    if variant == "LotResult":
+        json_size = len(results[0].to_json().encode("utf-8"))
+        binary_size = len(results[0].to_bytes())
+        start = time.perf_counter()
+        for result in results:
+            LotResult.from_bytes(result.to_bytes())
+        round_trip_us = (time.perf_counter() - start) / args.lots * 1e6
+    elif variant == "dict":
+        json_size = len(json.dumps(results[0], ensure_ascii=False).encode("utf-8"))
+    queue.put({
+        "variant": variant, "rss": rss, "traced": traced, "json": json_size, "binary": binary_size,
+        "round_trip_us": round_trip_us,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-result memory: dict with YOLO results vs LotResult")
+    parser.add_argument("--lots", type=int, default=10000)
+    parser.add_argument("--detections", type=int, default=5, help="рамок на лот")
+    parser.add_argument("--image-size", default="1280x960", help="размер orig_img после preprocess.load_image")
+    parser.add_argument("--variants", nargs="+", default=["dict+yolo", "dict", "LotResult"])
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"lots={args.lots} detections={args.detections} image={args.image_size}")
+    print(f"{'variant':>10} {'RSS/lot':>10} {'traced/lot':>11} {'JSON B':>7} {'binary B':>9} {'round trip':>11}")
+    for variant in args.variants:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=build, args=(variant, args, queue))
+        proc.start()
+        row = queue.get()
+        proc.join()
+        traced = f"{row['traced'] / 1024:>8.2f} KB" if row["traced"] is not None else f"{'-':>11}"
+        round_trip = f"{row['round_trip_us']:>8.1f} us" if row["round_trip_us"] is not None else f"{'-':>11}"
+        print(f"{variant:>10} {row['rss'] / 1024:>7.1f} KB {traced} {row['json'] or '-':>7} "
+              f"{row['binary'] or '-':>9} {round_trip}")
+
+
+if __name__ == "__main__":
+    main()
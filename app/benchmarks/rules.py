@@ -0,0 +1,88 @@
+# app/benchmarks/rules.py
+#
+# Микробенчмарк правил: цепочка any(kw in text) по категориям против
+# автомата Ахо-Корасик RuleEngine, плюс пакетная оценка риска.
+# Запуск из каталога app/:
+#   python -m benchmarks.rules --keywords 10000 --categories 500 --lots 2000
+
+import argparse
+import random
+import time
+
+from modules.rules import RuleEngine
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+OBJECTS = ["person", "car", "cat", "dog", "laptop", "book", "chair", "cell phone", "bottle", "cup"]
+
+
+def make_rules(n_keywords: int, n_categories: int, rng: random.Random) -> list:
+    categories = [{"name": f"cat_{i}", "keywords": [], "forbidden_objects": rng.sample(OBJECTS, 3)}
+                  for i in range(n_categories)]
+    for i in range(n_keywords):
+        word = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(6, 12)))
+        categories[i % n_categories]["keywords"].append(word)
+    return categories
+
+
+def make_texts(categories: list, n_lots: int, rng: random.Random) -> list:
+    """Описания лотов; примерно половина содержит ключевое слово случайной категории."""
+    texts = []
+    for _ in range(n_lots):
+        words = ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 9))) for _ in range(25)]
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words)), rng.choice(rng.choice(categories)["keywords"]))
+        texts.append(" ".join(words))
+    return texts
+
+
+def naive_category(categories: list, text: str) -> str:
+    text_lower = text.lower()
+    for category in categories:
+        if any(kw in text_lower for kw in category["keywords"]):
+            return category["name"]
+    return "другое"
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule evaluation microbenchmark")
+    parser.add_argument("--keywords", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=500)
+    parser.add_argument("--lots", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    categories = make_rules(args.keywords, args.categories, rng)
+    texts = make_texts(categories, args.lots, rng)
+
+    engine, compile_s = timed(RuleEngine, categories)
+    print(f"compile: {compile_s * 1000:.1f} ms for {args.keywords} keywords / {args.categories} categories")
+
+    naive, naive_s = timed(lambda: [naive_category(categories, t) for t in texts])
+    fast, fast_s = timed(lambda: [engine.categorize(t) for t in texts])
+    assert naive == fast, "Aho-Corasick result differs from the keyword chain"
+
+    detected = [rng.sample(OBJECTS, rng.randint(0, 4)) for _ in texts]
+    ai_results = [{"is_ai_generated": rng.random() < 0.1} for _ in texts]
+    sims = [rng.random() for _ in texts]
+    _, single_s = timed(lambda: [
+        engine.evaluate(t, d, a, s) for t, d, a, s in zip(texts, detected, ai_results, sims)
+    ])
+    _, batch_s = timed(engine.evaluate_batch, texts, detected, ai_results, sims)
+
+    per_lot = lambda seconds: seconds / len(texts) * 1e6
+    print(f"{'variant':<22} {'us/lot':>10} {'speedup':>8}")
+    print(f"{'naive any() chain':<22} {per_lot(naive_s):>10.1f} {1.0:>7.1f}x")
+    print(f"{'categorize':<22} {per_lot(fast_s):>10.1f} {naive_s / fast_s:>7.1f}x")
+    print(f"{'evaluate (per lot)':<22} {per_lot(single_s):>10.1f} {naive_s / single_s:>7.1f}x")
+    print(f"{'evaluate_batch':<22} {per_lot(batch_s):>10.1f} {naive_s / batch_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
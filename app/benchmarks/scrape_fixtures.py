@@ -0,0 +1,96 @@
+# app/benchmarks/scrape_fixtures.py
+#
+# Локальный сервер HTML-фикстур карточек WB/Ozon (data/fixtures/marketplace)
+# и замер parse_marketplace_bulk без обращения к маркетплейсам.
+# Запуск из каталога app/:
+#   python -m benchmarks.scrape_fixtures --urls 32 --workers 1 2 4
+#
+# Домен маркетплейса входит в путь фикстуры (/wildberries.ru/..., /ozon.ru/...),
+# поэтому парсер выбирает сайт так же, как для настоящих ссылок.
+
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.parser import parse_marketplace_bulk
+
+
+def make_handler(fixtures_dir: str, image_path: str):
+    pages = {}
+    for site in ("wildberries", "ozon"):
+        with open(os.path.join(fixtures_dir, f"{site}.html"), "rb") as f:
+            pages[f"/{site}.ru/"] = f.read()
+    with open(image_path, "rb") as f:
+        image = f.read()
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path.endswith("/product.jpg"):
+                self._send(image, "image/jpeg")
+                return
+            for prefix, page in pages.items():
+                if path.startswith(prefix):
+                    self._send(page, "text/html; charset=utf-8")
+                    return
+            self.send_error(404)
+
+        def _send(self, data: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(port: int = 0, fixtures_dir: str = "data/fixtures/marketplace",
+                         image_path: str = "data/local_lots/lot_001/image.jpg"):
+    """Запускает сервер фикстур в фоновом потоке. Возвращает (server, базовый url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fixtures_dir, image_path))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fixture_urls(base_url: str, count: int) -> list:
+    sites = ("wildberries.ru/catalog", "ozon.ru/product")
+    return [f"{base_url}/{sites[i % 2]}/{i}/detail.aspx" for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk scraping throughput against local fixtures")
+    parser.add_argument("--fixtures-dir", default="data/fixtures/marketplace")
+    parser.add_argument("--image", default="data/local_lots/lot_001/image.jpg")
+    parser.add_argument("--urls", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(fixtures_dir=args.fixtures_dir, image_path=args.image)
+    urls = fixture_urls(base_url, args.urls)
+    print(f"{'workers':>8} {'pages/sec':>10} {'ok':>5} {'errors':>7}")
+    try:
+        for workers in args.workers:
+            ok, errors = 0, []
+            start = time.perf_counter()
+            for url, image, title, error in parse_marketplace_bulk(urls, workers=workers):
+                if error is None and image is not None and title:
+                    ok += 1
+                else:
+                    errors.append(f"{url}: {error}")
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {len(urls) / elapsed:>10.2f} {ok:>5} {len(errors):>7}")
+            for line in errors[:3]:
+                print("   ", line)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
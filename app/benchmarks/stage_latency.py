@@ -0,0 +1,46 @@
+# app/benchmarks/stage_latency.py
+#
+# Задержка analyze_lot: последовательные модельные стадии против параллельных.
+# Запуск из каталога app/:
+#   python -m benchmarks.stage_latency --lots-dir data/local_lots --repeats 20
+
+import argparse
+import statistics
+import tempfile
+
+from modules.analyzer import LotAnalyzer
+from benchmarks.batch_throughput import load_corpus
+
+
+def measure(analyzer: LotAnalyzer, corpus: list, repeats: int) -> dict:
+    """Медианы таймингов по стадиям, мс."""
+    samples = {}
+    for i in range(repeats):
+        image, text = corpus[i % len(corpus)]
+        timings = analyzer.analyze_lot(image, text, f"stage_bench_{i}")["timings"]
+        for name, ms in timings.items():
+            samples.setdefault(name, []).append(ms)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs parallel model stages in analyze_lot")
+    parser.add_argument("--lots-dir", default="data/local_lots")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.lots_dir)
+    for parallel in (False, True):
+        with tempfile.TemporaryDirectory() as persist_dir:
+            analyzer = LotAnalyzer(persist_dir=persist_dir, parallel_stages=parallel)
+            measure(analyzer, corpus, repeats=2)  # прогрев
+            medians = measure(analyzer, corpus, args.repeats)
+        slowest = max(medians[name] for name in LotAnalyzer.MODEL_STAGES)
+        mode = "parallel" if parallel else "sequential"
+        stages = ", ".join(f"{name}={medians[name]:.0f}" for name in LotAnalyzer.MODEL_STAGES)
+        print(f"{mode:>10}: {stages}; models={medians['models']:.0f} "
+              f"(slowest stage {slowest:.0f}); total={medians['total']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# app/benchmarks/standins.py
+#
+# Детерминированные заменители моделей и синтетический корпус лотов для
+# прогонов без сети и весов (benchmarks/suite.py). Заменители реализуют тот же
+# интерфейс, что и настоящие модели, поэтому весь код LotAnalyzer вокруг них —
+# батчинг, кэш эмбеддингов, правила, ChromaDB, индекс фото — работает как обычно:
+#   StandInYOLO       — вызывается как ultralytics YOLO, находит цветные фигуры корпуса;
+#   StandInEncoder    — ClipEncoder с хешированными эмбеддингами текста и проекцией пикселей;
+#   StandInAIDetector — AIDetector с пайплайном, оценивающим «гладкость» изображения.
+# Одинаковый вход всегда даёт одинаковый выход, на любой машине.
+
+import hashlib
+import json
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from modules.ai_detector import AIDetector
+from modules.encoder import ClipEncoder
+from modules.rules import RULES_PATH
+
+# Классы заменителя YOLO и цвет, которым корпус рисует объект каждого класса
+CLASSES = {
+    0: ("person", (220, 40, 40)),
+    1: ("cell phone", (40, 40, 220)),
+    2: ("laptop", (40, 200, 40)),
+    3: ("car", (230, 200, 30)),
+    4: ("animal", (200, 40, 200)),
+    5: ("food", (30, 200, 200)),
+    6: ("chair", (120, 60, 20)),
+    7: ("cup", (250, 140, 0)),
+}
+PALETTE = np.array([color for _, color in CLASSES.values()], dtype=np.float32)
+GRID = 16
+
+
+class StandInYOLO:
+    """
+    Вызывается как модель ultralytics: model(source, verbose=False) -> список
+    результатов с boxes.cls / boxes.xyxy / boxes.conf и names. Объект класса —
+    область сетки GRID x GRID, цвет которой близок к цвету класса в PALETTE.
+    """
+
+    names = {cls: name for cls, (name, _) in CLASSES.items()}
+
+    def __init__(self, max_distance: float = 40.0):
+        self.max_distance = max_distance
+
+    def __call__(self, source, verbose: bool = False, **kwargs):
+        images = source if isinstance(source, (list, tuple)) else [source]
+        return [self._detect(image) for image in images]
+
+    def _detect(self, image: Image.Image):
+        width, height = image.size
+        cells = np.asarray(image.convert("RGB").resize((GRID, GRID), Image.NEAREST), dtype=np.float32)
+        distances = np.linalg.norm(cells[:, :, None, :] - PALETTE[None, None], axis=-1)
+        nearest = distances.argmin(axis=-1)
+        matched = distances.min(axis=-1) < self.max_distance
+
+        cls, xyxy, conf = [], [], []
+        for class_id in np.unique(nearest[matched]).tolist():
+            rows, cols = np.nonzero(matched & (nearest == class_id))
+            cls.append(class_id)
+            xyxy.append([
+                cols.min() * width / GRID, rows.min() * height / GRID,
+                (cols.max() + 1) * width / GRID, (rows.max() + 1) * height / GRID,
+            ])
+            conf.append(1.0 - float(distances[rows, cols, class_id].mean()) / (2 * self.max_distance))
+        boxes = SimpleNamespace(
+            cls=np.array(cls, dtype=np.float32),
+            xyxy=np.array(xyxy, dtype=np.float32).reshape(-1, 4),
+            conf=np.array(conf, dtype=np.float32),
+        )
+        return SimpleNamespace(boxes=boxes, names=self.names)
+
+
+class _StandInClipModel:
+    """Интерфейс SentenceTransformer: encode(список строк или изображений) -> (n, dim)."""
+
+    def __init__(self, dim: int = 512, seed: int = 0):
+        self.dim = dim
+        # Проекция пикселей 8x8 RGB в пространство эмбеддингов
+        self._projection = np.random.default_rng(seed).standard_normal((8 * 8 * 3, dim)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, inputs: list) -> np.ndarray:
+        if not inputs:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if isinstance(inputs[0], str):
+            embs = np.stack([self._encode_text(text) for text in inputs])
+        else:
+            pixels = np.stack([
+                np.asarray(image.convert("RGB").resize((8, 8)), dtype=np.float32).ravel() / 255.0 - 0.5
+                for image in inputs
+            ])
+            embs = pixels @ self._projection
+        return embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-6)
+
+    def _encode_text(self, text: str) -> np.ndarray:
+        """Хешированный мешок слов: похожие описания дают близкие векторы."""
+        emb = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            emb[index] += 1.0 if digest[4] & 1 else -1.0
+        return emb
+
+
+class StandInEncoder(ClipEncoder):
+    """ClipEncoder без загрузки весов: кэш запроса и блокировка — как у настоящего."""
+
+    def __init__(self, dim: int = 512, seed: int = 0):
+        self.model_name = f"standin-clip-{dim}"
+        self.model = _StandInClipModel(dim, seed)
+        self._lock = threading.Lock()
+
+
+class _StandInClassifierPipe:
+    """Интерфейс пайплайна image-classification: одно изображение или список с batch_size."""
+
+    def __call__(self, images, batch_size: int = None):
+        if isinstance(images, list):
+            return [self._classify(image) for image in images]
+        return self._classify(images)
+
+    @staticmethod
+    def _classify(image: Image.Image) -> list:
+        # Гладкие (заливка без текстуры) изображения считаются «сгенерированными»
+        spread = float(np.asarray(image.convert("L").resize((32, 32)), dtype=np.float32).std())
+        score = round(min(max(1.0 - spread / 64.0, 0.0), 1.0), 4)
+        return [{"label": "artificial", "score": score}, {"label": "real", "score": round(1.0 - score, 4)}]
+
+
+class StandInAIDetector(AIDetector):
+    """AIDetector с детерминированным пайплайном вместо модели Hugging Face."""
+
+    def __init__(self):
+        self.pipe = _StandInClassifierPipe()
+
+
+# --- синтетический корпус ---
+
+ADJECTIVES = ["новый", "б/у", "оригинальный", "недорогой", "качественный", "компактный", "премиум"]
+EXTRAS = ["доставка по городу", "гарантия год", "торг уместен", "в идеальном состоянии", "срочно", "полный комплект"]
+UNCATEGORIZED = ["Товар ручной работы", "Сувенир из путешествия", "Коллекционная вещь", "Подарочный набор"]
+
+
+class SyntheticCorpus:
+    """
+    Детерминированные лоты (image, text, lot_id): лот i зависит только от seed и i,
+    поэтому корпуса разного размера — префиксы одного и того же ряда.
+    Описания строятся из ключевых слов config/rules.json; часть лотов содержит
+    запрещённые для категории объекты, часть — повторно использует фото
+    более раннего лота (для кэша и индекса почти-дубликатов).
+    """
+
+    def __init__(self, seed: int = 0, image_size=(640, 480), forbidden_rate: float = 0.2,
+                 duplicate_rate: float = 0.1, uncategorized_rate: float = 0.1, rules_path: str = RULES_PATH):
+        self.seed = seed
+        self.image_size = tuple(image_size)
+        self.forbidden_rate = forbidden_rate
+        self.duplicate_rate = duplicate_rate
+        self.uncategorized_rate = uncategorized_rate
+        with open(rules_path, "r", encoding="utf-8") as f:
+            self.categories = json.load(f)["categories"]
+        self._class_ids = {name: cls for cls, (name, _) in CLASSES.items()}
+
+    def _rng(self, i: int, salt: int = 0):
+        return np.random.default_rng([self.seed, i, salt])
+
+    def lot(self, i: int, prefix: str = "synth"):
+        rng = self._rng(i)
+        if rng.random() < self.uncategorized_rate:
+            text = f"{UNCATEGORIZED[rng.integers(len(UNCATEGORIZED))]}, {EXTRAS[rng.integers(len(EXTRAS))]}"
+            forbidden = []
+        else:
+            category = self.categories[rng.integers(len(self.categories))]
+            keyword = category["keywords"][rng.integers(len(category["keywords"]))]
+            text = (f"{keyword.capitalize()} {ADJECTIVES[rng.integers(len(ADJECTIVES))]}, "
+                    f"модель {rng.integers(100, 999)}, {EXTRAS[rng.integers(len(EXTRAS))]}")
+            forbidden = [obj for obj in category.get("forbidden_objects", []) if obj in self._class_ids]
+        include = forbidden[:1] if rng.random() < self.forbidden_rate else []
+
+        # Повторное фото: изображение более раннего лота
+        source = i
+        if i > 0 and rng.random() < self.duplicate_rate:
+            source = int(rng.integers(0, i))
+        return self.image(source, avoid=forbidden, include=include), text, f"{prefix}_{i}"
+
+    def image(self, i: int, avoid=(), include=()) -> Image.Image:
+        """Фон с шумом и 1-2 цветные фигуры классов не из avoid, плюс объекты include."""
+        rng = self._rng(i, salt=1)
+        width, height = self.image_size
+        # Серый фон с шумом: не совпадает ни с одним цветом PALETTE
+        base = int(rng.integers(90, 170))
+        noise = rng.integers(-12, 13, (height, width, 1), dtype=np.int16)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8).repeat(3, axis=2)
+        image = Image.fromarray(pixels, "RGB")
+
+        draw = ImageDraw.Draw(image)
+        allowed = [cls for cls, (name, _) in CLASSES.items() if name not in avoid]
+        objects = rng.choice(allowed, size=int(rng.integers(1, 3)), replace=False).tolist()
+        objects += [self._class_ids[name] for name in include]
+        for cls in objects:
+            w, h = int(width * rng.uniform(0.2, 0.4)), int(height * rng.uniform(0.2, 0.4))
+            x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+            draw.rectangle([x, y, x + w, y + h], fill=CLASSES[cls][1])
+        return image
+
+    def lots(self, start: int, stop: int, prefix: str = "synth"):
+        for i in range(start, stop):
+            yield self.lot(i, prefix)
@@ -0,0 +1,118 @@
+# app/benchmarks/stub_ollama.py
+#
+# Локальная заглушка Ollama /api/generate для прогонов без сети и GPU.
+# Отвечает NDJSON-потоком токенов с заданной задержкой. Для тестов умеет
+# отвечать ошибкой (status) и обрывать соединение после drop_after токенов;
+# server.max_active — наибольшее число одновременно обслуживаемых запросов.
+#   python -m benchmarks.stub_ollama --port 11434 --tokens 64 --token-delay-ms 20
+
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(tokens: int, token_delay_ms: float, first_token_delay_ms: float,
+                 status: int = 200, drop_after: int = None):
+    class StubOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with self.server.active_lock:
+                self.server.active += 1
+                self.server.max_active = max(self.server.max_active, self.server.active)
+            try:
+                self._generate(body)
+            finally:
+                with self.server.active_lock:
+                    self.server.active -= 1
+
+        def _generate(self, body: dict):
+            if status != 200:
+                time.sleep(first_token_delay_ms / 1000)
+                data = json.dumps({"error": f"stub error {status}"}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            words = [f"слово{i} " for i in range(tokens)]
+
+            if not body.get("stream", True):
+                time.sleep((first_token_delay_ms + token_delay_ms * tokens) / 1000)
+                self._send_json({"model": body.get("model"), "response": "".join(words), "done": True})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(first_token_delay_ms / 1000)
+            for i, word in enumerate(words):
+                if i == drop_after:
+                    # Обрыв посреди ответа: без завершающего чанка
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self._send_chunk({"model": body.get("model"), "response": word, "done": False})
+                time.sleep(token_delay_ms / 1000)
+            self._send_chunk({"model": body.get("model"), "response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _send_chunk(self, payload: dict):
+            data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, payload: dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubOllamaHandler
+
+
+def start_stub_server(port: int = 0, tokens: int = 64, token_delay_ms: float = 5.0,
+                      first_token_delay_ms: float = 50.0, status: int = 200, drop_after: int = None):
+    """Запускает заглушку в фоновом потоке. Возвращает (server, url для RAGLLM)."""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), make_handler(tokens, token_delay_ms, first_token_delay_ms, status, drop_after)
+    )
+    server.daemon_threads = True
+    server.active, server.max_active = 0, 0
+    server.active_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama /api/generate server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    parser.add_argument("--first-token-delay-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.tokens, args.token_delay_ms, args.first_token_delay_ms)
+    print(f"Stub Ollama listening at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# app/benchmarks/suite.py
+#
+# Сквозной офлайн-бенчмарк на синтетическом корпусе нескольких размеров:
+#   analyze_lot  — тайминги стадий (yolo, ai_detector, clip, models, total и разбивка METRICS);
+#   vector_db    — пакетная запись add_lots и запрос query_similar при текущем размере базы;
+#   ai_detector  — AIDetector.detect_ai_image;
+#   rag_llm      — RAGLLM.generate_report против заглушки Ollama (benchmarks/stub_ollama.py).
+# По умолчанию модели заменены детерминированными заменителями (benchmarks/standins.py):
+# измеряется код конвейера вокруг моделей. --models real — настоящие модели из
+# локального кэша весов (HF_HUB_OFFLINE=1, сеть не используется).
+#
+# Результаты дописываются в JSON-историю; каждая метрика сравнивается с медианой
+# последних прогонов с той же конфигурацией, и заметные ухудшения помечаются.
+# Запуск из каталога app/:
+#   python -m benchmarks.suite --scales 100 1000 10000
+#   python -m benchmarks.suite --scales 1000 --fail-on-regression   # код выхода 1 при регрессии
+#   python -m benchmarks.suite --models real --scales 100 --samples 20
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.standins import StandInAIDetector, StandInEncoder, StandInYOLO, SyntheticCorpus
+from benchmarks.stub_ollama import start_stub_server
+
+HISTORY_PATH = "./data/benchmarks/history.json"
+# Лоты для замеров берутся из той же последовательности далеко за пределами корпуса
+PROBE_OFFSET = 10**8
+
+
+def percentile(values: list, q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def make_analyzer(models: str, persist_dir: str, **kwargs):
+    """LotAnalyzer с заменителями моделей или с настоящими моделями из кэша весов."""
+    from modules.analyzer import LotAnalyzer
+
+    if models == "real":
+        # Только локальный кэш весов: отсутствующая модель — ошибка, а не загрузка из сети
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        return LotAnalyzer(persist_dir=persist_dir, **kwargs)
+    return LotAnalyzer(
+        persist_dir=persist_dir, encoder=StandInEncoder(), yolo=StandInYOLO(), ai_detector=StandInAIDetector(),
+        **kwargs
+    )
+
+
+def fill(analyzer, corpus: SyntheticCorpus, start: int, stop: int, batch_size: int) -> float:
+    """Догружает лоты [start, stop) через analyze_lots. Возвращает лотов в секунду."""
+    begin, batch = time.perf_counter(), []
+    for lot in corpus.lots(start, stop):
+        batch.append(lot)
+        if len(batch) == batch_size:
+            analyzer.analyze_lots(batch)
+            batch = []
+    if batch:
+        analyzer.analyze_lots(batch)
+    return (stop - start) / (time.perf_counter() - begin)
+
+
+def measure_scale(analyzer, rag_llm, corpus: SyntheticCorpus, scale: int, probe_start: int, args) -> dict:
+    metrics = {}
+    probes = [corpus.lot(PROBE_OFFSET + probe_start + i, prefix="probe") for i in range(args.samples)]
+
+    # analyze_lot: по одному лоту, как в интерфейсе
+    stages, analyses = {}, []
+    for image, text, lot_id in probes:
+        result = analyzer.analyze_lot(image, text, lot_id)
+        analyses.append((result, text))
+        for name, ms in result["timings"].items():
+            stages.setdefault(name, []).append(ms)
+    for name, values in stages.items():
+        metrics[f"analyze_lot.{name}.p50_ms"] = percentile(values, 50)
+    metrics["analyze_lot.total.p95_ms"] = percentile(stages["total"], 95)
+
+    # VectorDB: запись пакета новых лотов и поиск похожих
+    vector_db = analyzer.vector_db
+    records = [
+        {"lot_id": f"{lot_id}_vdb", "text": text, "detected_objects": ["cell phone"],
+         "risk_level": "средний", "verdict": "Требуется проверка", "category": ""}
+        for _, text, lot_id in probes
+    ]
+    start = time.perf_counter()
+    vector_db.add_lots(records)
+    metrics["vector_db.add_lots.per_lot_ms"] = round((time.perf_counter() - start) * 1000 / len(records), 3)
+    latencies = []
+    for _, text, _ in probes:
+        start = time.perf_counter()
+        vector_db.query_similar(text, top_k=analyzer.rag_top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    metrics["vector_db.query_similar.p50_ms"] = percentile(latencies, 50)
+    metrics["vector_db.query_similar.p95_ms"] = percentile(latencies, 95)
+
+    # AIDetector по одному изображению
+    latencies = []
+    for image, _, _ in probes:
+        start = time.perf_counter()
+        analyzer.ai_detector.detect_ai_image(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+    metrics["ai_detector.detect_ai_image.p50_ms"] = percentile(latencies, 50)
+
+    # RAGLLM: полный путь до заглушки Ollama (шаблон и кэш отчётов отключены)
+    ttft, total = [], []
+    for result, text in analyses[:args.reports]:
+        sample = {}
+        rag_llm.generate_report(result, text, metrics=sample)
+        ttft.append(sample["ttft_ms"])
+        total.append(sample["total_ms"])
+    metrics["rag_llm.ttft.p50_ms"] = percentile(ttft, 50)
+    metrics["rag_llm.total.p50_ms"] = percentile(total, 50)
+    return metrics
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: list):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def compare(metrics: dict, history: list, config: dict, window: int, tolerance: float, floor_ms: float) -> list:
+    """
+    Сравнение с медианой последних window прогонов с той же конфигурацией.
+    Метрики *_ms — чем меньше, тем лучше, *_per_s — чем больше. Регрессия —
+    ухудшение больше tolerance (доля) и, для времени, больше floor_ms по абсолютной величине.
+    Возвращает строки (метрика, значение, база, изменение, регрессия ли).
+    """
+    previous = [run["metrics"] for run in history if run["config"] == config][-window:]
+    rows = []
+    for name, value in sorted(metrics.items()):
+        baseline = [run[name] for run in previous if name in run]
+        if not baseline:
+            rows.append((name, value, None, None, False))
+            continue
+        base = statistics.median(baseline)
+        change = (value - base) / base if base else 0.0
+        if name.endswith("_per_s"):
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance and value - base > floor_ms
+        rows.append((name, value, base, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark suite with regression tracking")
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--samples", type=int, default=50, help="лотов для замеров на каждом масштабе")
+    parser.add_argument("--reports", type=int, default=8, help="отчётов RAGLLM на каждом масштабе")
+    parser.add_argument("--batch-size", type=int, default=32, help="размер пакета при наполнении базы")
+    parser.add_argument("--models", choices=["standins", "real"], default="standins")
+    parser.add_argument("--image-size", default="640x480")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-token-delay-ms", type=float, default=1.0)
+    parser.add_argument("--llm-first-token-delay-ms", type=float, default=20.0)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--window", type=int, default=5, help="прогонов в базе сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение, доля")
+    parser.add_argument("--floor-ms", type=float, default=0.5, help="меньшие абсолютные изменения — шум")
+    parser.add_argument("--no-record", action="store_true", help="не дописывать прогон в историю")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    from modules.rag_llm import RAGLLM
+
+    width, height = map(int, args.image_size.split("x"))
+    corpus = SyntheticCorpus(seed=args.seed, image_size=(width, height))
+    # Сравнимы только прогоны с одинаковыми параметрами на одной машине
+    config = {
+        "models": args.models, "scales": sorted(args.scales), "samples": args.samples, "reports": args.reports,
+        "batch_size": args.batch_size, "image_size": args.image_size, "seed": args.seed,
+        "llm": [args.llm_tokens, args.llm_token_delay_ms, args.llm_first_token_delay_ms],
+        "host": platform.node(), "python": platform.python_version(),
+    }
+
+    metrics = {}
+    server, url = start_stub_server(
+        tokens=args.llm_tokens, token_delay_ms=args.llm_token_delay_ms,
+        first_token_delay_ms=args.llm_first_token_delay_ms
+    )
+    try:
+        rag_llm = RAGLLM(ollama_url=url, template_risk_levels=())
+        with tempfile.TemporaryDirectory() as persist_dir:
+            analyzer = make_analyzer(args.models, persist_dir)
+            analyzer.warm_up()
+            inserted = 0
+            for position, scale in enumerate(sorted(args.scales)):
+                metrics[f"{scale}.fill.lots_per_s"] = round(
+                    fill(analyzer, corpus, inserted, scale, args.batch_size), 2
+                )
+                inserted = scale
+                found = measure_scale(analyzer, rag_llm, corpus, scale, position * args.samples, args)
+                metrics.update({f"{scale}.{name}": value for name, value in found.items()})
+                print(f"scale {scale}: analyze_lot total p50 {found['analyze_lot.total.p50_ms']:.1f} ms, "
+                      f"query p50 {found['vector_db.query_similar.p50_ms']:.2f} ms", flush=True)
+    finally:
+        server.shutdown()
+
+    history = load_history(args.history)
+    rows = compare(metrics, history, config, args.window, args.tolerance, args.floor_ms)
+    print(f"\n{'metric':<58} {'value':>10} {'baseline':>10} {'change':>8}")
+    for name, value, base, change, regressed in rows:
+        base_text = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+        change_text = f"{change:>+8.1%}" if change is not None else f"{'-':>8}"
+        print(f"{name:<58} {value:>10.3f} {base_text} {change_text}{'  REGRESSION' if regressed else ''}")
+    regressions = [row[0] for row in rows if row[4]]
+
+    if not args.no_record:
+        history.append({
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **git_revision(),
+            "config": config,
+            "metrics": metrics,
+            "regressions": regressions,
+        })
+        save_history(args.history, history)
+        print(f"\nRecorded run #{len(history)} to {args.history}")
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
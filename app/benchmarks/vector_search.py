@@ -0,0 +1,130 @@
+# app/benchmarks/vector_search.py
+#
+# Точность и задержка HNSW-поиска по коллекции вида fraud_lots при её росте.
+# recall@k считается против точного перебора на numpy; отдельно — запросы
+# с фильтром по метаданным (уровень риска и категория).
+# Запуск из каталога app/:
+#   python -m benchmarks.vector_search --sizes 10000 100000 1000000 --search-ef 100
+#   python -m benchmarks.vector_search --sizes 10000 100000 1000000 10000000 --hnsw-m 32
+#
+# Векторы синтетические и генерируются порциями из фиксированного seed:
+# точный перебор повторно генерирует те же порции, поэтому даже 10M
+# записей не нужно держать в памяти целиком.
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from modules.vector_db import HNSW_DEFAULTS, make_where
+
+RISK_LEVELS = ("низкий", "средний", "высокий")
+CHUNK = 10000
+
+
+def make_chunk(index: int, dim: int, n_categories: int, seed: int):
+    """Порция index: нормированные векторы и метаданные, одинаковые при каждом вызове."""
+    rng = np.random.default_rng(seed + index)
+    vectors = rng.standard_normal((CHUNK, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    risks = rng.integers(0, len(RISK_LEVELS), CHUNK)
+    categories = rng.integers(0, n_categories, CHUNK)
+    return vectors, risks, categories
+
+
+def exact_top_k(queries: np.ndarray, size: int, k: int, args, risk: int = None, category: int = None) -> list:
+    """Точные top-k id перебором всех порций до size (с тем же фильтром, что и запрос)."""
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    for index in range(size // CHUNK):
+        vectors, risks, categories = make_chunk(index, args.dim, args.categories, args.seed)
+        scores = queries @ vectors.T
+        if risk is not None:
+            scores[:, (risks != risk) | (categories != category)] = -np.inf
+        ids = np.broadcast_to(np.arange(index * CHUNK, (index + 1) * CHUNK), scores.shape)
+        scores = np.hstack([best_scores, scores])
+        ids = np.hstack([best_ids, ids])
+        top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return [{f"id_{i}" for i in row} for row in best_ids]
+
+
+def measure(collection, queries: np.ndarray, k: int, where=None):
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, where=where, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(set(result["ids"][0]))
+    return latencies, found
+
+
+def recall(found: list, exact: list, k: int) -> float:
+    return float(np.mean([len(f & e) / k for f, e in zip(found, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall@k and latency vs collection size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_DEFAULTS["hnsw:M"])
+    parser.add_argument("--hnsw-construction-ef", type=int, default=HNSW_DEFAULTS["hnsw:construction_ef"])
+    parser.add_argument("--search-ef", type=int, default=HNSW_DEFAULTS["hnsw:search_ef"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import chromadb
+
+    rng = np.random.default_rng(args.seed + 10**6)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    # Фильтр: высокий риск в одной категории — около 1/(3*categories) коллекции
+    risk, category = RISK_LEVELS.index("высокий"), 0
+    where = make_where([RISK_LEVELS[risk]], f"cat_{category}")
+
+    print(f"M={args.hnsw_m} construction_ef={args.hnsw_construction_ef} search_ef={args.search_ef} k={args.k}")
+    print(f"{'size':>10} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'f.recall':>9} {'f.p50':>7} {'f.p99':>7}")
+    with tempfile.TemporaryDirectory() as persist_dir:
+        client = chromadb.PersistentClient(path=persist_dir)
+        collection = client.get_or_create_collection(name="bench_lots", metadata=dict(
+            HNSW_DEFAULTS, **{
+                "hnsw:M": args.hnsw_m,
+                "hnsw:construction_ef": args.hnsw_construction_ef,
+                "hnsw:search_ef": args.search_ef,
+            }
+        ))
+        max_batch = client.get_max_batch_size()
+        inserted = 0
+        for size in args.sizes:
+            size -= size % CHUNK
+            while inserted < size:
+                vectors, risks, categories = make_chunk(inserted // CHUNK, args.dim, args.categories, args.seed)
+                for start in range(0, CHUNK, max_batch):
+                    end = min(start + max_batch, CHUNK)
+                    collection.add(
+                        ids=[f"id_{inserted + i}" for i in range(start, end)],
+                        embeddings=vectors[start:end].tolist(),
+                        metadatas=[
+                            {"risk_level": RISK_LEVELS[r], "category": f"cat_{c}"}
+                            for r, c in zip(risks[start:end].tolist(), categories[start:end].tolist())
+                        ],
+                    )
+                inserted += CHUNK
+
+            latencies, found = measure(collection, queries, args.k)
+            f_latencies, f_found = measure(collection, queries, args.k, where)
+            exact = exact_top_k(queries, size, args.k, args)
+            f_exact = exact_top_k(queries, size, args.k, args, risk, category)
+            print(f"{size:>10} {recall(found, exact, args.k):>7.3f} "
+                  f"{np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 99):>7.2f} "
+                  f"{recall(f_found, f_exact, args.k):>9.3f} "
+                  f"{np.percentile(f_latencies, 50):>7.2f} {np.percentile(f_latencies, 99):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# app/benchmarks/worker_scaling.py
+#
+# Масштабирование ProcessLotAnalyzer по числу процессов-воркеров.
+# Запуск из каталога app/:
+#   python -m benchmarks.worker_scaling --lots-dir data/local_lots --workers 1 2 4
+#
+# Базовая строка "in-proc" — обычный LotAnalyzer в одном процессе со всеми
+# потоками torch. Для N воркеров ядра по умолчанию делятся поровну
+# (--torch-threads задаёт число потоков явно).
+
+import argparse
+import os
+import tempfile
+
+from modules.analyzer import LotAnalyzer
+from modules.worker_pool import ProcessLotAnalyzer
+from benchmarks.batch_throughput import load_corpus, run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lots/sec vs number of model worker processes")
+    parser.add_argument("--lots-dir", default="data/local_lots")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--torch-threads", type=int, help="потоков torch на воркер")
+    parser.add_argument("--batch-size", type=int, default=16, help="лотов в одном analyze_lots")
+    parser.add_argument("--total", type=int, default=128, help="лотов на каждый замер")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.lots_dir)
+    print(f"{'workers':>8} {'threads':>8} {'lots/sec':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as persist_dir:
+        analyzer = LotAnalyzer(persist_dir=persist_dir)
+        run(analyzer, corpus, batch_size=1, total=2)
+        baseline = run(analyzer, corpus, args.batch_size, args.total)
+        print(f"{'in-proc':>8} {os.cpu_count():>8} {baseline:>10.2f} {1.0:>7.2f}x")
+        del analyzer
+
+        for workers in args.workers:
+            analyzer = ProcessLotAnalyzer(
+                workers=workers, torch_threads=args.torch_threads, persist_dir=persist_dir
+            )
+            try:
+                # Загрузка моделей в воркерах не входит в замер
+                analyzer.start()
+                run(analyzer, corpus, batch_size=workers, total=workers)
+                lps = run(analyzer, corpus, args.batch_size, args.total)
+            finally:
+                analyzer.close()
+            print(f"{workers:>8} {analyzer.torch_threads:>8} {lps:>10.2f} {lps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
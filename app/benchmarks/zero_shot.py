@@ -0,0 +1,69 @@
+# app/benchmarks/zero_shot.py
+#
+# Задержка zero-shot категоризации в зависимости от размера таксономии.
+# Матрица меток синтетическая (случайные нормированные векторы размерности CLIP),
+# сохраняется в .npy и открывается через mmap, как рабочий индекс.
+# Запуск из каталога app/:
+#   python -m benchmarks.zero_shot --labels 1000 10000 50000 --batch-size 16
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from modules.zero_shot import ZeroShotClassifier
+
+
+def make_index(path: str, n_labels: int, dim: int, rng: np.random.Generator) -> list:
+    matrix = rng.standard_normal((n_labels, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.save(path, matrix)
+    return [{"label": f"label_{i}", "category": f"cat_{i % 500}"} for i in range(n_labels)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zero-shot classification latency vs taxonomy size")
+    parser.add_argument("--labels", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    images = rng.standard_normal((args.batch_size, args.dim)).astype(np.float32)
+    texts = rng.standard_normal((args.batch_size, args.dim)).astype(np.float32)
+
+    print(f"{'labels':>8} {'index MB':>9} {'cold ms':>8} {'batch ms':>9} {'per-lot ms':>11} {'loop ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_labels in args.labels:
+            path = os.path.join(tmp, f"labels-{n_labels}.npy")
+            labels = make_index(path, n_labels, args.dim, rng)
+            classifier = ZeroShotClassifier(
+                labels, np.load(path, mmap_mode="r"), min_image_score=-1.0, min_text_score=-1.0
+            )
+
+            # Первый вызов читает страницы индекса с диска
+            start = time.perf_counter()
+            expected = classifier.classify(images, texts)
+            cold_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                classifier.classify(images, texts)
+            batch_ms = (time.perf_counter() - start) * 1000 / args.repeats
+
+            # Для сравнения: отдельное умножение на каждый лот
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                looped = [classifier.classify(images[i:i + 1], texts[i:i + 1])[0] for i in range(len(images))]
+            loop_ms = (time.perf_counter() - start) * 1000 / args.repeats
+            assert [p["label"] for p in looped] == [p["label"] for p in expected]
+
+            print(f"{n_labels:>8} {os.path.getsize(path) / 2**20:>9.1f} {cold_ms:>8.2f} "
+                  f"{batch_ms:>9.2f} {batch_ms / args.batch_size:>11.3f} {loop_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
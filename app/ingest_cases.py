@@ -0,0 +1,74 @@
+# app/ingest_cases.py
+#
+# Загрузка исторических кейсов мошенничества в коллекцию fraud_lots.
+# Вход — JSONL, по строке на кейс:
+#   {"lot_id": "...", "text": "...", "detected_objects": ["person"], "risk_level": "высокий",
+#    "verdict": "...", "category": "..."}
+# Без category категория определяется по тексту правилами config/rules.json.
+# Пример (из каталога app/):
+#   python ingest_cases.py --input data/history/cases.jsonl --chunk-size 1024
+
+import argparse
+import json
+import logging
+import time
+
+from modules.rules import RuleEngine
+from modules.vector_db import HNSW_DEFAULTS, VectorDB
+
+logger = logging.getLogger("ingest_cases")
+
+
+def iter_cases(path: str, rules: RuleEngine):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            case = json.loads(line)
+            yield {
+                "lot_id": str(case["lot_id"]),
+                "text": case["text"],
+                "detected_objects": list(case.get("detected_objects") or []),
+                "risk_level": case.get("risk_level", "высокий"),
+                "verdict": case.get("verdict", "Исторический случай мошенничества"),
+                "category": case.get("category") or rules.categorize(case["text"]),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest historical fraud cases into fraud_lots")
+    parser.add_argument("--input", required=True, help="JSONL с кейсами")
+    parser.add_argument("--persist-dir", default="./data/chroma_db")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="кейсов на один add_lots")
+    # Параметры графа применяются только к новой коллекции
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_DEFAULTS["hnsw:M"])
+    parser.add_argument("--hnsw-construction-ef", type=int, default=HNSW_DEFAULTS["hnsw:construction_ef"])
+    parser.add_argument("--hnsw-search-ef", type=int, default=HNSW_DEFAULTS["hnsw:search_ef"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db = VectorDB(persist_dir=args.persist_dir, hnsw={
+        "hnsw:M": args.hnsw_m,
+        "hnsw:construction_ef": args.hnsw_construction_ef,
+        "hnsw:search_ef": args.hnsw_search_ef,
+    })
+    rules = RuleEngine.from_file()
+
+    chunk, start = [], time.perf_counter()
+    for case in iter_cases(args.input, rules):
+        chunk.append(case)
+        if len(chunk) >= args.chunk_size:
+            db.add_lots(chunk)
+            chunk = []
+            stats = db.stats()
+            logger.info("%d read, %d written, %.1f cases/sec",
+                        stats["lots_requested"], stats["lots_written"],
+                        stats["lots_requested"] / (time.perf_counter() - start))
+    if chunk:
+        db.add_lots(chunk)
+    logger.info("Done: %s", db.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,31 @@
 import streamlit as st
-from PIL import Image
 from modules.analyzer import LotAnalyzer
 from modules.rag_llm import RAGLLM
+from modules.result_cache import ResultCache, lot_fingerprint
+from modules.metrics import METRICS
+from modules.preprocess import load_image
+from modules.startup import PROFILER, warm_up
 from modules.visualizer import draw_bounding_boxes
 import os
 
 # Кэшируем загрузку моделей, чтобы не перезагружать их при каждом клике
 @st.cache_resource
 def load_models():
-    return LotAnalyzer(), RAGLLM()
+    # LOT_PARALLEL_STAGES=1 — YOLO, AI-детектор и CLIP выполняются параллельно
+    parallel = os.getenv("LOT_PARALLEL_STAGES", "0") == "1"
+    # LOT_BACKEND=torch|onnx|int8 — бэкенд инференса на CPU (см. modules/backends.py)
+    # LOT_CASCADE=1 — каскад: лот с однозначно высоким риском не проходит оставшиеся стадии
+    cascade = os.getenv("LOT_CASCADE", "0") == "1"
+    analyzer = LotAnalyzer(parallel_stages=parallel, backend=os.getenv("LOT_BACKEND", "torch"), cascade=cascade)
+    # Повторный клик или повторно загруженное фото не запускают модели заново
+    analyzer.result_cache = ResultCache(model_version=analyzer.model_version)
+    # Отчёты LLM кэшируются по контексту; низкий риск — шаблонный отчёт без LLM
+    rag_llm = RAGLLM(report_cache_path="./data/cache/reports.sqlite3")
+    # Модели загружаются лениво; LOT_WARMUP=1 (по умолчанию) загружает и прогревает
+    # их в фоне, пока пользователь заполняет форму
+    if os.getenv("LOT_WARMUP", "1") == "1":
+        warm_up(analyzer, background=True)
+    return analyzer, rag_llm
 
 analyzer, rag_llm = load_models()
 
@@ -26,14 +43,28 @@ with st.sidebar:
     )
     st.info("Система использует YOLOv8 для детекции, CLIP для семантики и ResNet для поиска дипфейков.")
 
+    if analyzer.result_cache is not None:
+        with st.expander("Кэш результатов"):
+            st.json(analyzer.result_cache.stats())
+    with st.expander("Время запуска, мс"):
+        st.json({"components": analyzer.loaded_components(), "timings": PROFILER.report()})
+    if analyzer.cascade:
+        with st.expander("Каскад стадий"):
+            st.json(analyzer.cascade_report())
+    with st.expander("Отчёты LLM"):
+        st.json(rag_llm.latency_stats())
+    if METRICS.enabled:
+        with st.expander("Метрики конвейера"):
+            st.json(METRICS.to_json())
+
 # === Функция запуска анализа (общая логика) ===
 def run_full_analysis(image, text_input, lot_id_prefix):
     if not image or not text_input:
         st.error("Необходимо загрузить изображение и ввести описание!")
         return
 
-    # Генерируем ID
-    lot_id = f"{lot_id_prefix}_{str(hash(text_input))[-6:]}"
+    # Генерируем ID: стабильный между перезапусками, в отличие от hash()
+    lot_id = f"{lot_id_prefix}_{lot_fingerprint(image, text_input)}"
 
     try:
         with st.spinner("⏳ Выполняется комплексный анализ..."):
@@ -45,7 +76,7 @@ def run_full_analysis(image, text_input, lot_id_prefix):
             
             with col1:
                 st.subheader("📸 Анализ изображения")
-                annotated_img = draw_bounding_boxes(image.copy(), analysis["yolo_results"])
+                annotated_img = draw_bounding_boxes(image.copy(), analysis)
                 st.image(annotated_img, caption="Детекция объектов (YOLOv8)", use_container_width=True)
                 st.write(f"**Найденные объекты:** {', '.join(analysis['detected_objects'])}")
 
@@ -54,17 +85,24 @@ def run_full_analysis(image, text_input, lot_id_prefix):
                 
                 # ИИ Детектор
                 ai_data = analysis["ai_detection"]
-                if ai_data["is_ai_generated"]:
+                if ai_data["ai_score"] is None:
+                    st.info("ℹ️ **ИИ-Генерация:** не проверялась — риск определён раньше")
+                elif ai_data["is_ai_generated"]:
                     st.error(f"⚠️ **ИИ-Генерация:** {ai_data['ai_score']*100:.1f}%")
                 else:
                     st.success(f"✅ **Изображение:** Реальное (Score: {ai_data['ai_score']:.2f})")
                 st.caption(ai_data["explanation"])
 
+                with st.expander("⏱️ Время стадий, мс"):
+                    st.json(analysis["timings"])
+
                 st.divider()
 
                 # Сходство текста
                 sim_score = analysis["similarity_score"]
-                if sim_score < 0.3:
+                if sim_score is None:
+                    st.info("ℹ️ **Сходство текст-фото:** не проверялось — риск определён раньше")
+                elif sim_score < 0.3:
                     st.error(f"📉 **Сходство текст-фото:** Низкое ({sim_score:.2f})")
                 elif sim_score < 0.5:
                     st.warning(f"⚠️ **Сходство текст-фото:** Среднее ({sim_score:.2f})")
@@ -86,16 +124,31 @@ def run_full_analysis(image, text_input, lot_id_prefix):
                 else:
                     st.info("Похожих подозрительных случаев не найдено.")
 
+                duplicates = analysis.get("duplicate_images")
+                if duplicates and duplicates["matches"]:
+                    st.warning(f"🔁 Это фото уже встречалось: лотов с ним — {duplicates['cluster_size']}")
+                    for match in duplicates["matches"]:
+                        st.caption(f"{match['lot_id']}: сходство {match['similarity']}, dHash ±{match['hamming']} бит")
+
             with col_llm:
                 st.subheader("📝 Вердикт AI-ассистента")
                 # Генерация отчёта LLM
                 report_placeholder = st.empty()
                 report_placeholder.text("Анализируем данные...")
                 
-                # ИСПРАВЛЕНИЕ: Передаем text_input вторым аргументом!
-                report = rag_llm.generate_report(analysis, text_input)
-                
+                # Отчёт выводится по мере генерации токенов
+                report = ""
+                llm_metrics = {}
+                for token in rag_llm.stream_report(analysis, text_input, metrics=llm_metrics):
+                    report += token
+                    report_placeholder.markdown(report + "▌")
                 report_placeholder.markdown(report)
+                if llm_metrics:
+                    source = {"llm": "LLM", "cache": "кэш", "template": "шаблон"}[llm_metrics["source"]]
+                    st.caption(
+                        f"Источник: {source}. Первый токен: {llm_metrics['ttft_ms']:.0f} мс, "
+                        f"отчёт целиком: {llm_metrics['total_ms'] / 1000:.1f} с"
+                    )
 
             # Итоговый статус
             st.divider()
@@ -127,7 +180,7 @@ if mode == "📤 Загрузка файла (Ручной режим)":
 
     if start_btn:
         if uploaded_file and user_text:
-            image = Image.open(uploaded_file).convert("RGB")
+            image = load_image(uploaded_file)
             run_full_analysis(image, user_text, "manual_upload")
         else:
             st.warning("Пожалуйста, загрузите изображение и введите текст описания.")
@@ -1,13 +1,16 @@
-from transformers import pipeline
 from PIL import Image
+from .backends import load_image_classifier
+from .metrics import METRICS
 
 class AIDetector:
-    def __init__(self):
+    MODEL_NAME = "umm-maybe/AI-image-detector"
+
+    def __init__(self, backend: str = "torch"):
         # Инициализируем пайплайн классификации изображений.
         # Модель автоматически скачается с Hugging Face (около 100-200 МБ)
         # При первом запуске это займет время!
-        print("Загрузка модели AI Detector...")
-        self.pipe = pipeline("image-classification", model="umm-maybe/AI-image-detector")
+        print(f"Загрузка модели AI Detector ({backend})...")
+        self.pipe = load_image_classifier(self.MODEL_NAME, backend=backend)
 
     def detect_ai_image(self, image: Image.Image) -> dict:
         """
@@ -17,8 +20,22 @@ class AIDetector:
             image = image.convert("RGB")
         
         # Прогоняем изображение через модель
-        results = self.pipe(image)
-        
+        with METRICS.span("ai_detector.pipe"):
+            results = self.pipe(image)
+        return self._interpret(results)
+
+    def detect_ai_images(self, images: list) -> list:
+        """
+        Пакетная версия detect_ai_image: все изображения идут через пайплайн одним батчем.
+        """
+        if not images:
+            return []
+        images = [img if img.mode == "RGB" else img.convert("RGB") for img in images]
+        with METRICS.span("ai_detector.pipe"):
+            batch_results = self.pipe(images, batch_size=len(images))
+        return [self._interpret(results) for results in batch_results]
+
+    def _interpret(self, results: list) -> dict:
         # Результат приходит в формате списка словарей: [{'label': 'artificial', 'score': 0.99}, ...]
         # Нам нужно найти score для метки 'artificial' (или 'fake')
         
@@ -1,93 +1,764 @@
 # app/modules/analyzer.py
 
+# Тяжёлые библиотеки (torch, ultralytics, transformers, chromadb) импортируются
+# при первой загрузке соответствующей модели, а не при импорте модуля
 from PIL import Image
-from ultralytics import YOLO
-from sentence_transformers import SentenceTransformer, util
-import chromadb
-from .ai_detector import AIDetector
-from .vector_db import VectorDB
-import os
+import numpy as np
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from .backends import load_yolo, resolve_backends
+from .image_index import dhash
+from .metrics import METRICS
+from .preprocess import PREPROCESS_VERSION, classifier_view
+from .result import LotResult
+from .result_cache import ResultCache, image_key, text_key
+from .rules import RuleEngine
+from .startup import PROFILER, LazyComponent
+
+logger = logging.getLogger(__name__)
+
+# Результат AI-детектора для лота, у которого каскад пропустил эту стадию
+SKIPPED_AI = {
+    "is_ai_generated": False,
+    "ai_score": None,
+    "explanation": "Проверка не выполнялась: уровень риска определён раньше.",
+}
 
 class LotAnalyzer:
-    def __init__(self):
-        # Модели компьютерного зрения
-        self.yolo = YOLO("yolov8n.pt")
-        self.clip = SentenceTransformer('clip-ViT-B-32')
-        self.ai_detector = AIDetector()
-        self.vector_db = VectorDB()
+    # Независимые модельные стадии: выполняются последовательно или параллельно
+    MODEL_STAGES = ("yolo", "ai_detector", "clip")
+    # Меняется при смене любой модели — инвалидирует ResultCache
+    MODEL_VERSION = "yolov8n.pt|umm-maybe/AI-image-detector|clip-ViT-B-32"
 
-    def get_category_from_text(self, text: str) -> str:
-        """Определяет категорию по ключевым словам (можно расширить)"""
-        text_lower = text.lower()
-        if any(kw in text_lower for kw in ["стул", "кресло", "стол", "мебель"]):
-            return "мебель"
-        elif any(kw in text_lower for kw in ["наушники", "колонка", "плеер", "аудио"]):
-            return "аудиотехника"
-        elif any(kw in text_lower for kw in ["телефон", "смартфон", "айфон", "самсунг"]):
-            return "телефоны"
-        elif any(kw in text_lower for kw in ["шлепанцы", "обувь", "ботинки", "кроссовки"]):
-            return "обувь"
-        else:
-            return "другое"
+    def __init__(self, persist_dir="./data/chroma_db", encoder=None,
+                 parallel_stages: bool = False, result_cache: ResultCache = None,
+                 backend="torch", rules: RuleEngine = None, zero_shot: bool = True,
+                 image_index: bool = True, rag_top_k: int = 2, rag_risk_levels=None,
+                 rag_same_category: bool = False, yolo=None, ai_detector=None,
+                 cascade: bool = False, cascade_order=None, cascade_defer: bool = True,
+                 cascade_max_pending: int = 256):
+        # Бэкенд инференса: одна строка для всех моделей или словарь по моделям
+        self.backends = resolve_backends(backend)
+        # Версия моделей с учётом бэкендов — для ResultCache
+        self.model_version = self.MODEL_VERSION + "|" + ",".join(
+            f"{model}={name}" for model, name in sorted(self.backends.items())
+        ) + "|" + PREPROCESS_VERSION
 
-    def analyze_lot(self, image: Image.Image, text: str, lot_id: str = "demo"):
-        # 1. Детекция объектов
-        yolo_results = self.yolo(image)
-        detected_objects = [yolo_results[0].names[int(cls)] for cls in yolo_results[0].boxes.cls]
-
-        # 2. Детекция ИИ-генерации
-        ai_result = self.ai_detector.detect_ai_image(image)
-
-        # 3. Семантическое сходство
-        img_emb = self.clip.encode(image, convert_to_tensor=True)
-        text_emb = self.clip.encode(text, convert_to_tensor=True)
-        similarity = util.cos_sim(img_emb, text_emb).item()
-
-        # 4. Логические правила по категории
-        category = self.get_category_from_text(text)
-        forbidden_objects = {
-            "мебель": ["person", "car", "animal", "laptop"],
-            "аудиотехника": ["person", "car", "animal", "food"],
-            "телефоны": ["person", "car", "animal", "cat", "dog"],
-            "обувь": ["person", "car", "laptop", "book"],
+        # Модели загружаются лениво, при первом обращении (или прогревом в фоне)
+        self._components = {
+            "yolo": LazyComponent("yolo", self._load_yolo),
+            # Один CLIP на процесс: тот же экземпляр используется векторной базой
+            "encoder": LazyComponent("clip", self._load_encoder),
+            "ai_detector": LazyComponent("ai_detector", self._load_ai_detector),
+            "vector_db": LazyComponent("vector_db", lambda: self._load_vector_db(persist_dir)),
+        }
+        if zero_shot:
+            # Категория по таксономии для лотов, не распознанных ключевыми словами
+            self._components["zero_shot"] = LazyComponent("zero_shot", self._load_zero_shot)
+        if image_index:
+            # Почти-дубликаты фото среди ранее проанализированных лотов
+            self._components["image_index"] = LazyComponent("image_index", self._load_image_index)
+        # Готовые модели (общие для нескольких анализаторов или их заменители
+        # в benchmarks/standins.py) подставляются вместо ленивой загрузки
+        for name, model in (("encoder", encoder), ("yolo", yolo), ("ai_detector", ai_detector)):
+            if model is not None:
+                self._components[name].set(model)
+
+        # Параллельный режим: YOLO, AI-детектор и CLIP в отдельных потоках.
+        # PyTorch отпускает GIL на время вычислений, поэтому задержка лота
+        # приближается к самой медленной модели, а не к сумме трёх.
+        self.parallel_stages = parallel_stages
+        self._executor = (
+            ThreadPoolExecutor(max_workers=len(self.MODEL_STAGES), thread_name_prefix="lot-stage")
+            if parallel_stages else None
+        )
+        # Одна модель не вызывается из двух потоков одновременно
+        self._stage_locks = {name: threading.Lock() for name in self.MODEL_STAGES}
+
+        # RAG-поиск: число кейсов и фильтры по метаданным (уровни риска, та же категория)
+        self.rag_top_k = rag_top_k
+        self.rag_risk_levels = rag_risk_levels
+        self.rag_same_category = rag_same_category
+
+        # Кэш результатов моделей для повторно загружаемых фото и описаний
+        self.result_cache = result_cache
+        # Правила категорий и запрещённых объектов компилируются один раз
+        self.rules = rules or RuleEngine.from_file()
+
+        # Каскад: модельные стадии по очереди, от дешёвой к дорогой; лот, для которого
+        # уже ясен «высокий» риск (запрещённый объект, ИИ-генерация, низкое сходство),
+        # дальше не идёт. cascade_order — фиксированный порядок стадий, None — по
+        # измеренной стоимости. cascade_defer — пропущенные стадии, запись в базу и
+        # индекс фото для таких лотов выполняются в фоне; иначе пропущенные стадии
+        # не выполняются, а лот пишется в базу сразу с уже полученными сигналами.
+        # Очередь фонового дообогащения ограничена cascade_max_pending лотами (каждый
+        # держит декодированное фото): сверх неё лоты пишутся сразу, как без cascade_defer.
+        self.cascade = cascade
+        if cascade_order and sorted(cascade_order) != sorted(self.MODEL_STAGES):
+            # Без какой-либо стадии её правило (например, сходство CLIP) молча не проверялось бы
+            raise ValueError(f"cascade_order must be a permutation of {self.MODEL_STAGES}, got {cascade_order!r}")
+        self.cascade_order = tuple(cascade_order) if cascade_order else None
+        self.cascade_defer = cascade_defer
+        self.cascade_max_pending = cascade_max_pending
+        self.cascade_stats = {
+            "lots": 0, "decided": Counter(), "skipped": Counter(), "deferred": 0, "overflow": 0, "pending": 0,
+            "stage_ms": Counter(), "stage_lots": Counter(),
         }
-        forbidden_list = forbidden_objects.get(category, [])
-        has_forbidden = any(obj in detected_objects for obj in forbidden_list)
-
-        # 5. Определение уровня риска
-        risk_level = "низкий"
-        if ai_result["is_ai_generated"] or similarity < 0.2 or has_forbidden:
-            risk_level = "высокий"
-        elif similarity < 0.4:
-            risk_level = "средний"
-
-        # 6. Сохранение лота в ChromaDB для будущих RAG-поисков
-        verdict_summary = (
+        self._stats_lock = threading.Lock()
+        self._enrich_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="lot-enrich") if cascade and cascade_defer else None
+        )
+        self._pending = set()
+        # Запись в ChromaDB и индекс фото — из запроса и из фонового дообогащения
+        self._db_lock = threading.Lock()
+
+    def _load_yolo(self):
+        return load_yolo(self.backends["yolo"], weights="yolov8n.pt")
+
+    def _load_encoder(self):
+        from .encoder import ClipEncoder
+        return ClipEncoder(backend=self.backends["clip"])
+
+    def _load_ai_detector(self):
+        from .ai_detector import AIDetector
+        return AIDetector(backend=self.backends["ai_detector"])
+
+    def _load_vector_db(self, persist_dir: str):
+        from .vector_db import VectorDB
+        return VectorDB(persist_dir=persist_dir, encoder=self.encoder)
+
+    def _load_zero_shot(self):
+        from .zero_shot import ZeroShotClassifier
+        return ZeroShotClassifier.load(self.encoder)
+
+    def _load_image_index(self):
+        from .image_index import ImageIndex
+        return ImageIndex(self.vector_db.client)
+
+    @property
+    def yolo(self):
+        return self._components["yolo"].get()
+
+    @property
+    def encoder(self):
+        return self._components["encoder"].get()
+
+    @property
+    def ai_detector(self):
+        return self._components["ai_detector"].get()
+
+    @property
+    def vector_db(self):
+        return self._components["vector_db"].get()
+
+    @property
+    def zero_shot(self):
+        component = self._components.get("zero_shot")
+        return component.get() if component is not None else None
+
+    @property
+    def image_index(self):
+        component = self._components.get("image_index")
+        return component.get() if component is not None else None
+
+    def warm_up(self):
+        """Прогоняет фиктивный вход через каждую модель (см. startup.warm_up)."""
+        dummy = Image.new("RGB", (320, 320), color=(127, 127, 127))
+        with PROFILER.timed("warmup:yolo"), self._stage_locks["yolo"]:
+            self.yolo(dummy, verbose=False)
+        with PROFILER.timed("warmup:ai_detector"), self._stage_locks["ai_detector"]:
+            self.ai_detector.detect_ai_image(dummy)
+        with PROFILER.timed("warmup:clip"), self._stage_locks["clip"]:
+            self.encoder.encode_image(dummy)
+            self.encoder.encode_text("прогрев")
+        with PROFILER.timed("warmup:vector_db"):
+            self.vector_db.collection.count()
+        with PROFILER.timed("warmup:zero_shot"):
+            self.zero_shot
+        with PROFILER.timed("warmup:image_index"):
+            self.image_index
+
+    def loaded_components(self) -> dict:
+        """{компонент: загружен ли} — для проверки готовности реплики."""
+        return {name: component.loaded for name, component in self._components.items()}
+
+    def get_category_from_text(self, text: str) -> str:
+        """Определяет категорию по ключевым словам (правила — в config/rules.json)"""
+        return self.rules.categorize(text)
+
+    def _apply_rules(self, text: str, detected_objects: list, ai_result: dict, similarity: float):
+        """Логические правила по категории и итоговый уровень риска."""
+        return self.rules.evaluate(text, detected_objects, ai_result, similarity)
+
+    @staticmethod
+    def _verdict_summary(risk_level: str) -> str:
+        return (
             "Подозрительный лот: высокое несоответствие или ИИ-изображение"
             if risk_level == "высокий"
             else "Несоответствие текста и изображения"
         )
-        self.vector_db.add_lot(
-            lot_id=lot_id,
-            text=text,
-            detected_objects=detected_objects,
-            risk_level=risk_level,
-            verdict=verdict_summary
-        )
 
-        # 7. RAG: поиск похожих случаев
-        query_text = f"Товар: {text}. Категория: {category}. Объекты: {', '.join(detected_objects)}"
-        rag_context = self.vector_db.query_similar(query_text, top_k=2)
+    @staticmethod
+    def _rag_query_text(text: str, category: str, detected_objects: list) -> str:
+        return f"Товар: {text}. Категория: {category}. Объекты: {', '.join(detected_objects)}"
+
+    @staticmethod
+    def _detections(yolo_result) -> list:
+        """Компактные детекции YOLO: метка, рамка xyxy, уверенность и id класса."""
+        boxes = yolo_result.boxes
+        return [
+            {"label": yolo_result.names[int(cls)], "box": [round(v, 1) for v in box], "score": round(score, 3),
+             "class_id": int(cls)}
+            for cls, box, score in zip(boxes.cls.tolist(), boxes.xyxy.tolist(), boxes.conf.tolist())
+        ]
+
+    def _run_model_stages(self, stages: dict):
+        """
+        Выполняет модельные стадии {имя: (функция, аргументы)}.
+        Возвращает (результаты, тайминги в мс); тайминг "models" — общее
+        время стадий, в параллельном режиме оно равно критическому пути.
+        """
+        def timed(name, fn, args):
+            with self._stage_locks[name]:
+                start = time.perf_counter()
+                out = fn(*args)
+                return out, (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        if self._executor is None:
+            done = {name: timed(name, fn, args) for name, (fn, args) in stages.items()}
+        else:
+            # copy_context — чтобы кэш эмбеддингов запроса был виден в потоках
+            futures = {
+                name: self._executor.submit(contextvars.copy_context().run, timed, name, fn, args)
+                for name, (fn, args) in stages.items()
+            }
+            done = {name: future.result() for name, future in futures.items()}
+
+        outputs = {name: out for name, (out, _) in done.items()}
+        timings = {name: round(ms, 1) for name, (_, ms) in done.items()}
+        timings["models"] = round((time.perf_counter() - start) * 1000, 1)
+        for name, ms in timings.items():
+            METRICS.observe(f"stage.{name}.ms", ms)
+        return outputs, timings
+
+    def _detect_objects_batch(self, images: list) -> list:
+        """
+        YOLO по пакету изображений. Изображения группируются по размеру:
+        для батча разных размеров ultralytics делает квадратный letterbox,
+        а для одного размера — прямоугольный, как при одиночном вызове.
+        Так детекции совпадают с покадровым запуском.
+        """
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(image.size, []).append(i)
+
+        yolo_results = [None] * len(images)
+        for indices in groups.values():
+            results = self.yolo([images[i] for i in indices])
+            for i, res in zip(indices, results):
+                yolo_results[i] = [res]
+        return yolo_results
+
+    def _embed_batch(self, images: list, texts: list):
+        return self.encoder.encode_images(images), self.encoder.encode_texts(texts)
+
+    def infer(self, images: list, texts: list):
+        """
+        Только модельные стадии, без кэша и векторной базы.
+        Списки images и texts независимы (могут быть разной длины).
+        Возвращает (записи изображений, записи текстов, сырые результаты YOLO, тайминги);
+        записи — словари того же вида, что хранит ResultCache.
+        """
+        stages = {}
+        # Один уменьшенный вариант на изображение для обоих классификаторов;
+        # YOLO получает исходное (его рамки — в координатах изображения)
+        small = [classifier_view(image) for image in images]
+        if images:
+            stages["yolo"] = (self._detect_objects_batch, (images,))
+            stages["ai_detector"] = (self.ai_detector.detect_ai_images, (small,))
+        if images or texts:
+            stages["clip"] = (self._embed_batch, (small, texts))
+        outputs, timings = self._run_model_stages(stages)
+
+        image_entries, text_entries, yolo_results = [], [], []
+        if images:
+            yolo_results = outputs["yolo"]
+            image_entries = [
+                {
+                    "detections": self._detections(yolo_results[j][0]),
+                    "ai_detection": outputs["ai_detector"][j],
+                    "image_embedding": outputs["clip"][0][j].tolist(),
+                }
+                for j in range(len(images))
+            ]
+        if texts:
+            text_entries = [{"text_embedding": emb.tolist()} for emb in outputs["clip"][1]]
+        return image_entries, text_entries, yolo_results, timings
 
+    @staticmethod
+    def similarity(image_entry: dict, text_entry: dict) -> float:
+        """Косинусное сходство CLIP-эмбеддингов изображения и текста."""
+        from sentence_transformers import util
+        return util.cos_sim(
+            np.asarray(image_entry["image_embedding"], dtype=np.float32),
+            np.asarray(text_entry["text_embedding"], dtype=np.float32)
+        ).item()
+
+    @staticmethod
+    def _complete(image_entry: dict) -> bool:
+        return all(key in image_entry for key in ("detections", "ai_detection", "image_embedding"))
+
+    def _similarity_or_none(self, image_entry: dict, text_entry: dict):
+        if "image_embedding" not in image_entry or text_entry is None:
+            return None
+        return self.similarity(image_entry, text_entry)
+
+    def _stage_cost(self, name: str):
+        """Средняя стоимость стадии на лот, мс; None — ещё не измерялась."""
+        with self._stats_lock:
+            lots = self.cascade_stats["stage_lots"][name]
+            return self.cascade_stats["stage_ms"][name] / lots if lots else None
+
+    def _cascade_stages(self) -> tuple:
+        """Порядок стадий каскада: заданный или по измеренной стоимости (до замеров — MODEL_STAGES)."""
+        if self.cascade_order:
+            return self.cascade_order
+        costs = {name: self._stage_cost(name) for name in self.MODEL_STAGES}
+        if any(cost is None for cost in costs.values()):
+            return self.MODEL_STAGES
+        return tuple(sorted(self.MODEL_STAGES, key=costs.get))
+
+    def _run_stage(self, name: str, images: list, texts: list, image_entries: list, text_entries: list,
+                   indices: list, views: dict, record: bool = True):
+        """
+        Стадия name для лотов indices, у которых её результата ещё нет
+        (после кэша или предыдущего прогона). Дописывает результаты в записи.
+        Возвращает время стадии в мс или None, если выполнять было нечего.
+        record=False — не учитывать в статистике каскада (фоновое дообогащение).
+        """
+        def view(i):
+            if i not in views:
+                views[i] = classifier_view(images[i])
+            return views[i]
+
+        if name == "yolo":
+            todo = [i for i in indices if "detections" not in image_entries[i]]
+            if not todo:
+                return None
+            outputs, timings = self._run_model_stages(
+                {"yolo": (self._detect_objects_batch, ([images[i] for i in todo],))}
+            )
+            for i, res in zip(todo, outputs["yolo"]):
+                image_entries[i]["detections"] = self._detections(res[0])
+        elif name == "ai_detector":
+            todo = [i for i in indices if "ai_detection" not in image_entries[i]]
+            if not todo:
+                return None
+            outputs, timings = self._run_model_stages(
+                {"ai_detector": (self.ai_detector.detect_ai_images, ([view(i) for i in todo],))}
+            )
+            for i, ai in zip(todo, outputs["ai_detector"]):
+                image_entries[i]["ai_detection"] = ai
+        else:
+            todo_images = [i for i in indices if "image_embedding" not in image_entries[i]]
+            todo_texts = [i for i in indices if text_entries[i] is None]
+            todo = sorted(set(todo_images) | set(todo_texts))
+            if not todo:
+                return None
+            outputs, timings = self._run_model_stages({"clip": (
+                self._embed_batch, ([view(i) for i in todo_images], [texts[i] for i in todo_texts])
+            )})
+            image_embs, text_embs = outputs["clip"]
+            for i, emb in zip(todo_images, image_embs):
+                image_entries[i]["image_embedding"] = emb.tolist()
+            for i, emb in zip(todo_texts, text_embs):
+                text_entries[i] = {"text_embedding": emb.tolist()}
+
+        if record:
+            with self._stats_lock:
+                self.cascade_stats["stage_ms"][name] += timings[name]
+                self.cascade_stats["stage_lots"][name] += len(todo)
+        return timings[name]
+
+    def _infer_cascade(self, images: list, texts: list, image_entries: list, text_entries: list,
+                       categories: list, sources: list):
+        """
+        Модельные стадии в режиме каскада. После каждой стадии (и сразу после
+        кэша) лоты с однозначно высоким риском выбывают. Возвращает
+        (записи изображений — возможно неполные, записи текстов — None для
+        невычисленных, стадия-решение по лотам или None, тайминги).
+        """
+        n = len(images)
+        image_entries = [dict(entry) if entry is not None else {} for entry in image_entries]
+        text_entries = list(text_entries)
+        # Категория окончательна, если найдена по ключевым словам (или zero-shot выключен)
+        final = [
+            categories[i] if sources[i] == "keywords" or "zero_shot" not in self._components else None
+            for i in range(n)
+        ]
+        decided, views, timings = [None] * n, {}, {}
+
+        def settle(stage: str):
+            for i in range(n):
+                if decided[i] is None:
+                    entry = image_entries[i]
+                    detected = [det["label"] for det in entry["detections"]] if "detections" in entry else None
+                    if self.rules.is_high_risk(final[i], detected, entry.get("ai_detection"),
+                                               self._similarity_or_none(entry, text_entries[i])):
+                        decided[i] = stage
+
+        start = time.perf_counter()
+        settle("cache")
+        for name in self._cascade_stages():
+            remaining = [i for i in range(n) if decided[i] is None]
+            if not remaining:
+                break
+            ms = self._run_stage(name, images, texts, image_entries, text_entries, remaining, views)
+            if ms is not None:
+                timings[name] = ms
+                settle(name)
+        timings["models"] = round((time.perf_counter() - start) * 1000, 1)
+
+        with self._stats_lock:
+            stats = self.cascade_stats
+            stats["lots"] += n
+            for i in range(n):
+                if decided[i] is not None:
+                    stats["decided"][decided[i]] += 1
+                    METRICS.inc(f"cascade.decided.{decided[i]}")
+                for name in self._skipped_stages(image_entries[i], text_entries[i]):
+                    stats["skipped"][name] += 1
+                    METRICS.inc(f"cascade.skipped.{name}")
+        return image_entries, text_entries, decided, timings
+
+    @staticmethod
+    def _skipped_stages(image_entry: dict, text_entry: dict) -> list:
+        skipped = []
+        if "detections" not in image_entry:
+            skipped.append("yolo")
+        if "ai_detection" not in image_entry:
+            skipped.append("ai_detector")
+        if "image_embedding" not in image_entry or text_entry is None:
+            skipped.append("clip")
+        return skipped
+
+    def _cascade_summary(self, decided: str, image_entry: dict, text_entry: dict, deferred: bool):
+        if decided is None:
+            return None
         return {
-            "lot_id": lot_id,
-            "detected_objects": detected_objects,
-            "similarity_score": round(similarity, 3),
-            "ai_detection": ai_result,
-            "risk_level": risk_level,
-            "rag_context": rag_context,
-            "yolo_results": yolo_results,
-            "category": category,
-            "has_forbidden": has_forbidden,
-            "forbidden_objects": forbidden_list
-        }
\ No newline at end of file
+            "decided_by": decided,
+            "skipped": self._skipped_stages(image_entry, text_entry) + ["rag"],
+            "deferred": deferred,
+        }
+
+    def _defer_enrichment(self, items: list):
+        """Отправляет лоты с вердиктом каскада на фоновое дообогащение."""
+        with self._stats_lock:
+            self.cascade_stats["deferred"] += len(items)
+            self.cascade_stats["pending"] += len(items)
+        future = self._enrich_executor.submit(self._enrich, items)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _enrich(self, items: list):
+        """
+        Фоновое дообогащение: пропущенные каскадом стадии, полные записи в кэш,
+        запись лотов в ChromaDB и индекс фото — чтобы они находились будущими RAG-поисками.
+        """
+        try:
+            images = [item["image"] for item in items]
+            texts = [item["text"] for item in items]
+            image_entries = [item["image_entry"] for item in items]
+            text_entries = [item["text_entry"] for item in items]
+            indices, views = list(range(len(items))), {}
+            with METRICS.span("cascade.enrich"):
+                for name in self.MODEL_STAGES:
+                    self._run_stage(name, images, texts, image_entries, text_entries, indices, views, record=False)
+
+            if self.result_cache is not None:
+                for item, image_entry, text_entry in zip(items, image_entries, text_entries):
+                    if item["image_key"] is not None:
+                        self.result_cache.put(item["image_key"], image_entry)
+                    if item["text_key"] is not None:
+                        self.result_cache.put(item["text_key"], text_entry)
+            with self._db_lock:
+                self.vector_db.add_lots([
+                    {
+                        "lot_id": item["lot_id"],
+                        "text": item["text"],
+                        "detected_objects": [det["label"] for det in entry["detections"]],
+                        "risk_level": item["risk_level"],
+                        "verdict": self._verdict_summary(item["risk_level"]),
+                        "category": item["category"],
+                    }
+                    for item, entry in zip(items, image_entries)
+                ])
+                if self.image_index is not None:
+                    self.image_index.find_and_add(
+                        [item["lot_id"] for item in items],
+                        [entry["image_embedding"] for entry in image_entries],
+                        [dhash(image) for image in images],
+                    )
+            METRICS.inc("cascade.enriched", len(items))
+        except Exception:
+            METRICS.inc("cascade.enrich.errors")
+            logger.exception("Background enrichment failed for %d lots", len(items))
+        finally:
+            with self._stats_lock:
+                self.cascade_stats["pending"] -= len(items)
+
+    def flush_enrichment(self, timeout: float = None):
+        """Дожидается фонового дообогащения (перед выходом из пакетного прогона)."""
+        for future in list(self._pending):
+            future.result(timeout=timeout)
+
+    def cascade_report(self) -> dict:
+        """
+        Статистика каскада по обработанному трафику: доля лотов, решённых каждой
+        стадией, доля пропусков каждой стадии и средняя модельная задержка на лот —
+        фактическая и оценка без каскада (пропущенные стадии по их средней стоимости).
+        """
+        with self._stats_lock:
+            stats = {key: Counter(value) if isinstance(value, Counter) else value
+                     for key, value in self.cascade_stats.items()}
+        lots = stats["lots"]
+        if not lots:
+            return {"lots": 0}
+        cost = {
+            name: stats["stage_ms"][name] / stats["stage_lots"][name]
+            for name in self.MODEL_STAGES if stats["stage_lots"][name]
+        }
+        actual = sum(stats["stage_ms"].values())
+        full = actual + sum(cost.get(name, 0.0) * stats["skipped"][name] for name in self.MODEL_STAGES)
+        return {
+            "lots": lots,
+            "decided": {name: round(count / lots, 4) for name, count in stats["decided"].items()},
+            "skipped": {name: round(stats["skipped"][name] / lots, 4) for name in self.MODEL_STAGES},
+            "deferred": stats["deferred"],
+            # Лоты в очереди дообогащения сейчас и записанные сразу из-за её переполнения
+            "pending": stats["pending"],
+            "max_pending": self.cascade_max_pending,
+            "overflow": stats["overflow"],
+            "stage_cost_ms": {name: round(ms, 2) for name, ms in cost.items()},
+            "avg_models_ms": round(actual / lots, 2),
+            "avg_models_ms_without_cascade": round(full / lots, 2),
+            "latency_reduction": round(1 - actual / full, 4) if full else 0.0,
+        }
+
+    def analyze_lot(self, image: Image.Image, text: str, lot_id: str = "demo"):
+        return self.analyze_lots([(image, text, lot_id)])[0]
+
+    def analyze_lots(self, batch):
+        """
+        Пакетный анализ лотов: batch — список кортежей (image, text, lot_id).
+        YOLO, AI-детектор и CLIP получают все изображения одним батчем,
+        запись в ChromaDB — один collection.add, RAG-поиск — один collection.query.
+
+        Результаты совпадают с последовательными вызовами analyze_lot для лотов
+        пакета по порядку: rag_context лота включает его самого и предшествующие
+        лоты пакета, но не последующие.
+        """
+        with self.encoder.request_scope(), METRICS.request_timings() as breakdown:
+            results = self._analyze_lots(batch)
+        # Разбивка по компонентам (кодирование CLIP, запросы Chroma и т.д.)
+        # добавляется к таймингам стадий, если метрики включены
+        for result in results:
+            result["timings"].update(breakdown)
+        return results
+
+    def _analyze_lots(self, batch):
+        batch = list(batch)
+        if not batch:
+            return []
+        images = [item[0] for item in batch]
+        texts = [item[1] for item in batch]
+        lot_ids = [item[2] for item in batch]
+        n = len(batch)
+        start = time.perf_counter()
+
+        # 0. Кэш: для повторных фото/описаний модели не запускаются
+        image_entries, text_entries = [None] * n, [None] * n
+        if self.result_cache is not None:
+            image_keys = [image_key(image) for image in images]
+            text_keys = [text_key(text) for text in texts]
+            image_entries = [self.result_cache.get(key) for key in image_keys]
+            text_entries = [self.result_cache.get(key) for key in text_keys]
+        run_images = [i for i in range(n) if image_entries[i] is None]
+        run_texts = [i for i in range(n) if text_entries[i] is None]
+        METRICS.inc("lots.analyzed", n)
+        METRICS.observe("analyze.batch_size", n)
+        if self.result_cache is not None:
+            METRICS.inc("cache.image.hits", n - len(run_images))
+            METRICS.inc("cache.text.hits", n - len(run_texts))
+            METRICS.inc("cache.image.misses", len(run_images))
+            METRICS.inc("cache.text.misses", len(run_texts))
+
+        # Категория по ключевым словам нужна каскаду до моделей (запрещённые объекты)
+        categories = [self.rules.categorize(text) for text in texts]
+        sources = ["default" if c == self.rules.default_category else "keywords" for c in categories]
+
+        # 1-3. Детекция объектов, ИИ-генерации и CLIP-эмбеддинги.
+        # Сырые результаты ultralytics (тензоры, исходное изображение) дальше
+        # не передаются: в результате остаются только компактные детекции
+        if self.cascade:
+            image_entries, text_entries, decided, timings = self._infer_cascade(
+                images, texts, image_entries, text_entries, categories, sources
+            )
+        else:
+            fresh_images, fresh_texts, _, timings = self.infer(
+                [images[i] for i in run_images], [texts[i] for i in run_texts]
+            )
+            for j, i in enumerate(run_images):
+                image_entries[i] = fresh_images[j]
+            for j, i in enumerate(run_texts):
+                text_entries[i] = fresh_texts[j]
+            decided = [None] * n
+        if self.result_cache is not None:
+            # В кэш — только полные записи: после каскада часть стадий могла не выполняться
+            for i in run_images:
+                if self._complete(image_entries[i]):
+                    self.result_cache.put(image_keys[i], image_entries[i])
+            for i in run_texts:
+                if text_entries[i] is not None:
+                    self.result_cache.put(text_keys[i], text_entries[i])
+
+        # Пропущенная каскадом стадия: детекций нет, проверка ИИ и сходство неизвестны
+        detections = [entry.get("detections", []) for entry in image_entries]
+        detected = [[det["label"] for det in dets] for dets in detections]
+        ai_results = [entry.get("ai_detection", SKIPPED_AI) for entry in image_entries]
+        similarities = [self._similarity_or_none(image_entries[i], text_entries[i]) for i in range(n)]
+        # Лоты с неопределённым каскадом вердиктом: для них — RAG-поиск
+        active = [i for i in range(n) if decided[i] is None]
+        # Лоты с вердиктом каскада: в фоне дообогащаются, пока в очереди есть место
+        settled = [i for i in range(n) if decided[i] is not None]
+        deferred = []
+        if settled and self.cascade_defer:
+            with self._stats_lock:
+                room = max(self.cascade_max_pending - self.cascade_stats["pending"], 0)
+                deferred = settled[:room]
+                self.cascade_stats["overflow"] += len(settled) - len(deferred)
+            METRICS.inc("cascade.overflow", len(settled) - len(deferred))
+        # Запись в базу и индекс фото: лоты без фонового дообогащения пишутся сразу,
+        # с тем, что успели получить стадии
+        deferred_set = set(deferred)
+        written = [i for i in range(n) if i not in deferred_set]
+        indexed = [i for i in written if "image_embedding" in image_entries[i]]
+
+        # 4. Категория: для нераспознанных ключевыми словами — zero-shot по CLIP-эмбеддингу
+        # описания. Фото не участвует: по этой категории проверяются запрещённые
+        # объекты на том же фото, и оно не должно само себе задавать категорию
+        predictions = [None] * n
+        fallback = [i for i in range(n) if sources[i] == "default" and text_entries[i] is not None]
+        if fallback and self.zero_shot is not None:
+            with METRICS.span("zero_shot.classify"):
+                found = self.zero_shot.classify(
+                    None, [text_entries[i]["text_embedding"] for i in fallback], image_weight=0.0
+                )
+            for i, prediction in zip(fallback, found):
+                if prediction is not None:
+                    predictions[i] = prediction
+                    # Фоновые метки таксономии (товары вне категорий правил) категорию не меняют
+                    if prediction["category"] != self.rules.default_category:
+                        categories[i], sources[i] = prediction["category"], "zero_shot"
+            METRICS.inc("zero_shot.categorized", sum(
+                p is not None and p["category"] != self.rules.default_category for p in found
+            ))
+
+        # 5. Правила и уровень риска (неизвестное сходство не влияет на риск)
+        rules = self.rules.evaluate_batch(
+            texts, detected, ai_results,
+            [float("nan") if sim is None else sim for sim in similarities], categories
+        )
+
+        # 6. Пакетная запись в ChromaDB для будущих RAG-поисков и RAG-поиск.
+        # Как при анализе лотов по одному: лот сначала записывается, затем ищет,
+        # поэтому находит себя и предшествующие лоты пакета, но не последующие.
+        # Документы пакета кодируются один раз; ещё не записанные лоты пакета
+        # учитываются в поиске из памяти, затем пакет пишется одним upsert
+        with self._db_lock:
+            pending = self.vector_db.encode_lots([
+                {
+                    "lot_id": lot_ids[i],
+                    "text": texts[i],
+                    "detected_objects": detected[i],
+                    "risk_level": rules[i][3],
+                    "verdict": self._verdict_summary(rules[i][3]),
+                    "category": rules[i][0],
+                }
+                for i in written
+            ])
+            position = {}
+            for i in written:
+                position.setdefault(lot_ids[i], i)
+            positions = [position[entry["lot"]["lot_id"]] for entry in pending]
+
+            # 7. RAG: один запрос на весь пакет
+            rag_contexts = [[] for _ in range(n)]
+            found = self.vector_db.query_similar_batch(
+                [self._rag_query_text(texts[i], rules[i][0], detected[i]) for i in active],
+                top_k=self.rag_top_k, risk_levels=self.rag_risk_levels,
+                categories=[rules[i][0] for i in active] if self.rag_same_category else None,
+                pending=pending, visible=[bisect.bisect_right(positions, i) for i in active]
+            )
+            for i, context in zip(active, found):
+                rag_contexts[i] = context
+            self.vector_db.write_encoded(pending)
+
+            # 7б. Индекс фото: почти-дубликаты и кластеры повторно используемых фото
+            duplicates = [None] * n
+            if self.image_index is not None and indexed:
+                found = self.image_index.find_and_add(
+                    [lot_ids[i] for i in indexed],
+                    [image_entries[i]["image_embedding"] for i in indexed],
+                    [dhash(images[i]) for i in indexed],
+                )
+                for i, duplicate in zip(indexed, found):
+                    duplicates[i] = duplicate
+
+        # Лоты с вердиктом каскада: оставшиеся стадии, запись в базу и индекс фото — в фоне
+        if deferred:
+            self._defer_enrichment([
+                {
+                    "image": images[i], "text": texts[i], "lot_id": lot_ids[i],
+                    "image_entry": image_entries[i], "text_entry": text_entries[i],
+                    "image_key": image_keys[i] if self.result_cache is not None and i in run_images else None,
+                    "text_key": text_keys[i] if self.result_cache is not None and i in run_texts else None,
+                    "category": rules[i][0], "risk_level": rules[i][3],
+                }
+                for i in deferred
+            ])
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        METRICS.observe("stage.total.ms", timings["total"])
+
+        fresh = set(run_images) | set(run_texts)
+        results = []
+        for i in range(n):
+            category, forbidden_list, has_forbidden, risk_level = rules[i]
+            results.append(LotResult.from_detections(
+                detections[i],
+                lot_id=lot_ids[i],
+                similarity_score=None if similarities[i] is None else round(similarities[i], 3),
+                ai_detection=ai_results[i],
+                risk_level=risk_level,
+                rag_context=rag_contexts[i],
+                from_cache=i not in fresh,
+                category=category,
+                # keywords | zero_shot | default
+                category_source=sources[i],
+                zero_shot=predictions[i],
+                has_forbidden=has_forbidden,
+                # {"cluster_id", "cluster_size", "matches"}; None без индекса фото
+                duplicate_images=duplicates[i],
+                forbidden_objects=forbidden_list,
+                # {"decided_by", "skipped", "deferred"}; None, если каскад не сработал
+                cascade=self._cascade_summary(decided[i], image_entries[i], text_entries[i], i in deferred_set),
+                # Тайминги стадий общие для пакета, у каждого результата — своя копия
+                timings=dict(timings),
+            ))
+        return results
@@ -0,0 +1,140 @@
+# app/modules/backends.py
+#
+# Бэкенды инференса для CPU:
+#   torch — исходные модели PyTorch fp32;
+#   onnx  — экспорт в ONNX и запуск через ONNX Runtime (YOLO и AI-детектор; CLIP — torch);
+#   int8  — динамическое квантование весов в int8.
+# Экспортированные файлы кладутся в models/ и переиспользуются между запусками.
+
+import os
+from .startup import PROFILER
+
+BACKENDS = ("torch", "onnx", "int8")
+MODEL_DIR = os.getenv("LOT_MODEL_DIR", "./models")
+
+# Допуски паритета с torch-бэкендом
+PARITY_TOLERANCES = {"ai_score": 0.05, "similarity": 0.02}
+
+
+def resolve_backends(backend) -> dict:
+    """
+    Строка ("onnx") или словарь {"yolo": ..., "ai_detector": ..., "clip": ...}.
+    У CLIP нет ONNX-бэкенда (см. load_sentence_transformer): строка "onnx"
+    даёт CLIP на torch, а явный {"clip": "onnx"} отклоняется сразу, а не при первом лоте.
+    """
+    if isinstance(backend, str):
+        backend = {"yolo": backend, "ai_detector": backend, "clip": "torch" if backend == "onnx" else backend}
+    resolved = {"yolo": "torch", "ai_detector": "torch", "clip": "torch"}
+    resolved.update(backend or {})
+    for model, name in resolved.items():
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown backend {name!r} for {model}; expected one of {BACKENDS}")
+    if resolved["clip"] == "onnx":
+        raise ValueError("ONNX backend is not available for CLIP; use 'int8' or 'torch'")
+    return resolved
+
+
+def load_yolo(backend: str = "torch", weights: str = "yolov8n.pt"):
+    with PROFILER.timed("import:ultralytics"):
+        from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(weights)
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    onnx_path = os.path.join(MODEL_DIR, f"{stem}.onnx")
+    if not os.path.exists(onnx_path):
+        exported = YOLO(weights).export(format="onnx", dynamic=True)
+        os.replace(exported, onnx_path)
+    if backend == "onnx":
+        return YOLO(onnx_path, task="detect")
+
+    # int8: динамическое квантование ONNX-графа (веса Conv/MatMul в int8)
+    int8_path = os.path.join(MODEL_DIR, f"{stem}.int8.onnx")
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return YOLO(int8_path, task="detect")
+
+
+def load_image_classifier(model_name: str, backend: str = "torch"):
+    """Пайплайн image-classification transformers с выбранным бэкендом."""
+    with PROFILER.timed("import:transformers"):
+        from transformers import pipeline
+
+    if backend == "torch":
+        return pipeline("image-classification", model=model_name)
+
+    if backend == "int8":
+        import torch
+        pipe = pipeline("image-classification", model=model_name, device="cpu")
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipe
+
+    # onnx: модель экспортируется optimum и исполняется ONNX Runtime
+    from optimum.onnxruntime import ORTModelForImageClassification
+    from transformers import AutoImageProcessor
+
+    export_dir = os.path.join(MODEL_DIR, model_name.replace("/", "__") + "-onnx")
+    if os.path.isdir(export_dir):
+        model = ORTModelForImageClassification.from_pretrained(export_dir)
+    else:
+        model = ORTModelForImageClassification.from_pretrained(model_name, export=True)
+        model.save_pretrained(export_dir)
+    processor = AutoImageProcessor.from_pretrained(model_name)
+    return pipeline("image-classification", model=model, image_processor=processor)
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch"):
+    with PROFILER.timed("import:sentence_transformers"):
+        from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        # ONNX-бэкенд sentence-transformers поддерживает только текстовые
+        # трансформеры; мультимодальный CLIP-модуль он не экспортирует
+        raise ValueError("ONNX backend is not available for CLIP; use 'int8' or 'torch'")
+
+    model = SentenceTransformer(model_name, device="cpu" if backend == "int8" else None)
+    if backend == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def check_parity(reference, candidate, samples: list, tolerances: dict = None) -> dict:
+    """
+    Сравнивает выходы двух LotAnalyzer (обычно torch и кандидат) на samples —
+    списке пар (image, text): классы YOLO, ai_score и сходство CLIP.
+    Возвращает сводку с максимальными отклонениями и флагом passed.
+    """
+    tolerances = {**PARITY_TOLERANCES, **(tolerances or {})}
+    images = [image for image, _ in samples]
+    texts = [text for _, text in samples]
+    ref_images, ref_texts, _, _ = reference.infer(images, texts)
+    cand_images, cand_texts, _, _ = candidate.infer(images, texts)
+
+    class_mismatches, max_ai, max_sim = 0, 0.0, 0.0
+    for i in range(len(samples)):
+        ref_classes = sorted(det["label"] for det in ref_images[i]["detections"])
+        cand_classes = sorted(det["label"] for det in cand_images[i]["detections"])
+        class_mismatches += ref_classes != cand_classes
+        max_ai = max(max_ai, abs(
+            ref_images[i]["ai_detection"]["ai_score"] - cand_images[i]["ai_detection"]["ai_score"]
+        ))
+        max_sim = max(max_sim, abs(
+            reference.similarity(ref_images[i], ref_texts[i])
+            - candidate.similarity(cand_images[i], cand_texts[i])
+        ))
+
+    return {
+        "samples": len(samples),
+        "class_mismatches": class_mismatches,
+        "max_ai_score_diff": round(max_ai, 4),
+        "max_similarity_diff": round(max_sim, 4),
+        "passed": (
+            class_mismatches == 0
+            and max_ai <= tolerances["ai_score"]
+            and max_sim <= tolerances["similarity"]
+        ),
+    }
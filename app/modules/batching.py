@@ -0,0 +1,101 @@
+# app/modules/batching.py
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import METRICS
+
+
+class QueueFullError(Exception):
+    """Очередь батчера заполнена — клиенту следует повторить запрос позже."""
+
+
+class MicroBatcher:
+    """
+    Динамический микробатчинг для asyncio-сервиса. Запросы копятся в очереди,
+    пока не наберётся max_batch_size элементов или не пройдёт max_wait_ms
+    с прихода первого; затем пакет целиком уходит в process_batch
+    (синхронная функция список -> список результатов) в отдельном потоке.
+
+    Очередь ограничена max_queue: при переполнении submit сразу бросает
+    QueueFullError (обратное давление). Запросы, отменённые по таймауту
+    до начала обработки, в пакет не попадают.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 max_queue: int = 256, workers: int = 1):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        # Модели не допускают параллельных вызовов, поэтому по умолчанию один поток
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="microbatch")
+        self._workers = workers
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self._workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item, timeout: float = None):
+        """Ставит элемент в очередь и ждёт результат; asyncio.TimeoutError по истечении timeout."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            METRICS.inc("batcher.rejected")
+            raise QueueFullError(f"queue is full ({self.max_queue} pending)")
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            METRICS.inc("batcher.timeouts")
+            raise
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Отменённые (истёкшие) запросы не обрабатываем
+        return [entry for entry in batch if not entry[1].done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            now = time.perf_counter()
+            for _, _, enqueued in batch:
+                METRICS.observe("batcher.queue_wait.ms", (now - enqueued) * 1000)
+            METRICS.observe("batcher.batch_size", len(batch))
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.process_batch, [item for item, _, _ in batch]
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -1,7 +1,8 @@
 # app/modules/data_loader.py
 
+import json
 import os
-from PIL import Image
+from .preprocess import load_image
 
 def load_local_data(image_path: str, text_path: str):
     """Загружает изображение и текст из локальных файлов."""
@@ -10,7 +11,7 @@ def load_local_data(image_path: str, text_path: str):
     if not os.path.exists(text_path):
         raise FileNotFoundError(f"Text not found: {text_path}")
 
-    image = Image.open(image_path).convert("RGB")
+    image = load_image(image_path)
     with open(text_path, "r", encoding="utf-8") as f:
         text = f.read().strip()
     return image, text
@@ -19,3 +20,56 @@ def load_local_data(image_path: str, text_path: str):
 def mock_input():
     """Заглушка для демо: возвращает путь к тестовым данным."""
     return "data/demo_image.jpg", "data/demo_text.txt"
+
+
+def _find_image(lot_dir: str):
+    """image.jpg или любой image.* в каталоге лота."""
+    default = os.path.join(lot_dir, "image.jpg")
+    if os.path.exists(default):
+        return default
+    for name in sorted(os.listdir(lot_dir)):
+        if os.path.splitext(name)[0] == "image":
+            return os.path.join(lot_dir, name)
+    return None
+
+
+def iter_local_lots(lots_dir: str):
+    """
+    Потоково обходит каталоги lot_XXX/ и отдаёт описания лотов
+    {"lot_id", "image_path", "text"} без декодирования изображений.
+    """
+    with os.scandir(lots_dir) as entries:
+        lot_dirs = sorted(entry.path for entry in entries if entry.is_dir())
+    for lot_dir in lot_dirs:
+        image_path = _find_image(lot_dir)
+        text_path = os.path.join(lot_dir, "description.txt")
+        if image_path is None or not os.path.exists(text_path):
+            continue
+        with open(text_path, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+        yield {"lot_id": os.path.basename(lot_dir), "image_path": image_path, "text": text}
+
+
+def iter_manifest(manifest_path: str):
+    """
+    Потоково читает JSONL-манифест: по строке на лот с полями
+    lot_id, image (путь к фото) и text либо text_path.
+    Относительные пути считаются от каталога манифеста.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            image_path = os.path.join(base_dir, record.get("image") or record["image_path"])
+            text = record.get("text")
+            if text is None:
+                with open(os.path.join(base_dir, record["text_path"]), "r", encoding="utf-8") as tf:
+                    text = tf.read().strip()
+            yield {
+                "lot_id": str(record.get("lot_id", f"line_{line_no}")),
+                "image_path": image_path,
+                "text": text,
+            }
@@ -0,0 +1,72 @@
+# app/modules/encoder.py
+
+import contextvars
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from .backends import load_sentence_transformer
+from .metrics import METRICS
+
+# Кэш эмбеддингов текущего запроса. None — кэш выключен (вне request_scope).
+_request_cache = contextvars.ContextVar("clip_request_cache", default=None)
+
+
+class ClipEncoder:
+    """
+    Единственный экземпляр CLIP на процесс: его получают по внедрению
+    и LotAnalyzer, и VectorDB. Внутри request_scope одна и та же строка
+    кодируется не более одного раза.
+    """
+
+    def __init__(self, model_name: str = "clip-ViT-B-32", backend: str = "torch"):
+        print(f"Загрузка CLIP ({model_name}, {backend})...")
+        self.model_name = model_name
+        self.model = load_sentence_transformer(model_name, backend=backend)
+        # Быстрые токенизаторы HF не допускают одновременного использования из
+        # нескольких потоков, а энкодер общий для стадии CLIP и векторной базы
+        self._lock = threading.Lock()
+
+    def _encode(self, inputs: list, span: str):
+        with METRICS.span(span), self._lock:
+            return self.model.encode(inputs)
+
+    @contextmanager
+    def request_scope(self):
+        """Открывает кэш эмбеддингов на время одного запроса (лота или пакета)."""
+        if _request_cache.get() is not None:
+            # Вложенный вызов (например, analyze_lot внутри analyze_lots) — общий кэш
+            yield
+            return
+        token = _request_cache.set({})
+        try:
+            yield
+        finally:
+            _request_cache.reset(token)
+
+    def encode_texts(self, texts: list) -> np.ndarray:
+        """Кодирует список строк; уже закодированные в этом запросе берутся из кэша."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        cache = _request_cache.get()
+        if cache is None:
+            return self._encode(texts, "clip.encode_texts")
+
+        missing = list(dict.fromkeys(t for t in texts if t not in cache))
+        if missing:
+            for text, emb in zip(missing, self._encode(missing, "clip.encode_texts")):
+                cache[text] = emb
+        return np.stack([cache[t] for t in texts])
+
+    def encode_text(self, text: str) -> np.ndarray:
+        return self.encode_texts([text])[0]
+
+    def encode_images(self, images: list) -> np.ndarray:
+        images = list(images)
+        if not images:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return self._encode(images, "clip.encode_images")
+
+    def encode_image(self, image) -> np.ndarray:
+        return self.encode_images([image])[0]
@@ -0,0 +1,214 @@
+# app/modules/image_index.py
+#
+# Индекс почти-дубликатов фото: одно украденное фото у многих лотов —
+# типичный признак сети мошенников. Отдельная коллекция Chroma (HNSW, косинус)
+# с CLIP-эмбеддингами изображений, которые LotAnalyzer уже посчитал;
+# в метаданных — dHash фото и идентификатор кластера дубликатов.
+
+import numpy as np
+
+from .metrics import METRICS
+from .vector_db import HNSW_DEFAULTS
+
+
+def dhash(image, hash_size: int = 8) -> str:
+    """Разностный перцептивный хеш: 64 бита сравнений соседних пикселей, hex-строка."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = np.packbits((pixels[:, 1:] > pixels[:, :-1]).flatten())
+    return bits.tobytes().hex()
+
+
+def hamming(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+class ImageIndex:
+    """
+    Кластеры строятся инкрементально: новое фото, похожее на уже известное
+    (косинусное сходство не ниже threshold), получает кластер лучшего совпадения,
+    иначе открывает свой кластер с id своего лота. Если фото похоже на лоты
+    нескольких кластеров, кластеры сливаются в самый крупный. Поиск выполняется
+    до вставки, дубликаты внутри одного пакета сравниваются между собой напрямую.
+
+    Размер кластера хранится в метаданных его корня — лота, чей id совпадает
+    с id кластера (cluster_size), и обновляется при каждой вставке: на пакет
+    читаются только записи его лотов и корни затронутых кластеров, а при
+    открытии индекса — только collection.count().
+    """
+
+    def __init__(self, client, collection_name: str = "lot_images", threshold: float = 0.95,
+                 top_k: int = 5, hnsw: dict = None):
+        self.collection = client.get_or_create_collection(
+            name=collection_name,
+            metadata=dict(HNSW_DEFAULTS, **(hnsw or {}))
+        )
+        self.max_batch_size = client.get_max_batch_size()
+        self.threshold = threshold
+        self.top_k = top_k
+        # Число фото в коллекции: читается один раз, дальше ведётся при вставке
+        self._count = self.collection.count()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def nearest(self, embeddings: np.ndarray) -> list:
+        """Кандидаты из коллекции: для каждого фото список (lot_id, сходство, метаданные)."""
+        total = self._count
+        if not total:
+            return [[] for _ in range(len(embeddings))]
+        with METRICS.span("chroma.image_query"):
+            results = self.collection.query(
+                query_embeddings=embeddings.tolist(),
+                n_results=min(self.top_k + 1, total),
+                include=["distances", "metadatas"]
+            )
+        return [
+            [(lot_id, 1.0 - distance, meta) for lot_id, distance, meta in zip(ids, distances, metas)]
+            for ids, distances, metas in zip(results["ids"], results["distances"], results["metadatas"])
+        ]
+
+    def _metadatas(self, ids) -> dict:
+        """Метаданные записей по id (отсутствующие в коллекции пропускаются)."""
+        ids = sorted(set(ids))
+        if not ids:
+            return {}
+        with METRICS.span("chroma.image_get"):
+            found = self.collection.get(ids=ids, include=["metadatas"])
+        return dict(zip(found["ids"], found["metadatas"]))
+
+    def _cluster_sizes(self, clusters) -> dict:
+        """Размеры кластеров из метаданных корней."""
+        roots = self._metadatas(clusters)
+        sizes = {}
+        for cluster in set(clusters):
+            meta = roots.get(cluster, {})
+            if "cluster_size" in meta:
+                sizes[cluster] = meta["cluster_size"]
+            else:
+                # Кластер из индекса, созданного до хранения размеров: пересчёт один раз
+                with METRICS.span("chroma.image_get"):
+                    sizes[cluster] = len(self.collection.get(where={"cluster": cluster}, include=[])["ids"])
+        return sizes
+
+    def _upsert(self, ids: list, embeddings: np.ndarray, metadatas: list):
+        for start in range(0, len(ids), self.max_batch_size):
+            end = start + self.max_batch_size
+            with METRICS.span("chroma.image_upsert"):
+                self.collection.upsert(
+                    ids=ids[start:end], embeddings=embeddings[start:end].tolist(), metadatas=metadatas[start:end]
+                )
+
+    def _update(self, ids: list, metadatas: list):
+        # update меняет только переданные ключи, остальные метаданные сохраняются
+        for start in range(0, len(ids), self.max_batch_size):
+            end = start + self.max_batch_size
+            with METRICS.span("chroma.image_update"):
+                self.collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+    def add(self, lot_ids: list, embeddings, hashes: list):
+        """Вставка новых фото без поиска дубликатов: каждое — свой кластер."""
+        self._upsert(
+            list(lot_ids), np.asarray(embeddings, dtype=np.float32),
+            [{"cluster": lot_id, "dhash": h, "cluster_size": 1} for lot_id, h in zip(lot_ids, hashes)]
+        )
+        self._count += len(lot_ids)
+
+    def find_and_add(self, lot_ids: list, embeddings: list, hashes: list) -> list:
+        """
+        Ищет почти-дубликаты для пакета фото и добавляет их в индекс.
+        Возвращает по лоту {"cluster_id", "cluster_size", "matches": [{"lot_id", "similarity", "hamming"}]}.
+        """
+        if not lot_ids:
+            return []
+        embs = np.asarray(embeddings, dtype=np.float32)
+        embs /= np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+        candidates = self.nearest(embs)
+        # Дубликаты внутри пакета: лоты ещё не в коллекции
+        batch_sims = embs @ embs.T
+
+        # Лоты пакета, уже бывшие в индексе (повторный анализ), и размеры кластеров-кандидатов
+        existing = {lot_id: meta["cluster"] for lot_id, meta in self._metadatas(lot_ids).items()}
+        sizes = self._cluster_sizes(
+            [meta["cluster"] for found in candidates for _, _, meta in found] + list(existing.values())
+        )
+        stored = dict(sizes)
+
+        # Слияния в этом пакете: поглощённый кластер -> поглотивший
+        merged = {}
+
+        def resolve(cluster):
+            while cluster in merged:
+                cluster = merged[cluster]
+            return cluster
+
+        clusters, matches, first = [], [], {}
+        for i, lot_id in enumerate(lot_ids):
+            if lot_id in first:
+                # Повтор id внутри пакета — тот же результат, что у первого вхождения
+                clusters.append(clusters[first[lot_id]])
+                matches.append(matches[first[lot_id]])
+                continue
+            first[lot_id] = i
+            # Повторный анализ лота: его кластер участвует наравне с найденными
+            own = resolve(existing[lot_id]) if lot_id in existing else None
+            found = [
+                (other_id, similarity, meta["dhash"], resolve(meta["cluster"]))
+                for other_id, similarity, meta in candidates[i]
+                if other_id != lot_id and similarity >= self.threshold
+            ]
+            for j in range(i):
+                if first.get(lot_ids[j]) == j and batch_sims[i, j] >= self.threshold:
+                    found.append((lot_ids[j], float(batch_sims[i, j]), hashes[j], resolve(clusters[j])))
+            # Лот пакета может уже быть в коллекции: одно совпадение на id
+            found = list({match[0]: match for match in sorted(found, key=lambda m: m[1])}.values())
+            found.sort(key=lambda match: -match[1])
+
+            involved = {match[3] for match in found} | ({own} if own is not None else set())
+            if not involved:
+                cluster = lot_id
+                sizes[cluster] = 0
+            else:
+                # Фото связывает несколько кластеров — остаётся самый крупный
+                cluster = max(involved, key=lambda c: (sizes.get(c, 0), c))
+                for other in involved - {cluster}:
+                    merged[other] = cluster
+                    sizes[cluster] += sizes.pop(other, 0)
+            if lot_id not in existing:
+                sizes[cluster] += 1
+            clusters.append(cluster)
+            matches.append([
+                {"lot_id": other_id, "similarity": round(similarity, 3), "hamming": hamming(hashes[i], other_hash)}
+                for other_id, similarity, other_hash, _ in found[:self.top_k]
+            ])
+        clusters = [resolve(cluster) for cluster in clusters]
+        unique = list(first.values())
+        batch_ids = {lot_ids[i] for i in unique}
+
+        # Сохранённые участники поглощённых кластеров переходят в поглотивший
+        for source in merged:
+            if stored.get(source):
+                with METRICS.span("chroma.image_get"):
+                    members = self.collection.get(where={"cluster": source}, include=[])["ids"]
+                moved = sorted(set(members) - batch_ids)
+                self._update(moved, [{"cluster": resolve(source)}] * len(moved))
+            METRICS.inc("image_index.merges")
+
+        # Запись пакета; размер кластера — в метаданных корня
+        self._upsert(
+            [lot_ids[i] for i in unique], embs[unique],
+            [
+                {"cluster": clusters[i], "dhash": hashes[i],
+                 **({"cluster_size": sizes[clusters[i]]} if lot_ids[i] == clusters[i] else {})}
+                for i in unique
+            ]
+        )
+        roots = sorted({clusters[i] for i in unique} - batch_ids)
+        self._update(roots, [{"cluster_size": sizes[root]} for root in roots])
+        self._count += len(batch_ids - set(existing))
+
+        METRICS.inc("image_index.duplicates", sum(1 for m in matches if m))
+        return [
+            {"cluster_id": cluster, "cluster_size": sizes[cluster], "matches": lot_matches}
+            for cluster, lot_matches in zip(clusters, matches)
+        ]
@@ -0,0 +1,170 @@
+# app/modules/metrics.py
+#
+# Лёгкая инструментация конвейера: таймеры стадий, счётчики, гистограммы.
+# Экспорт — текстовый формат Prometheus или JSON. При LOT_METRICS=0 span()
+# возвращает общий пустой контекст, и накладные расходы сводятся к одному вызову.
+
+import bisect
+import contextvars
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Границы гистограмм задержек, мс
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Границы гистограмм размеров пакетов
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_NULL_SPAN = nullcontext()
+# Разбивка времени текущего запроса: {span: мс}; None — не собирается
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя ячейка — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе ячейки."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else math.inf
+        return math.inf
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.metrics.observe(self.name + ".ms", elapsed_ms)
+        timings = _request_timings.get()
+        if timings is not None:
+            # Словарь запроса общий для его потоков (стадии моделей идут параллельно)
+            with self.metrics._lock:
+                timings[self.name] = round(timings.get(self.name, 0.0) + elapsed_ms, 1)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Таймер участка кода: with METRICS.span("chroma.query"): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def inc(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                if buckets is None:
+                    buckets = LATENCY_BUCKETS_MS if name.endswith(".ms") else SIZE_BUCKETS
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def request_timings(self):
+        """
+        Собирает разбивку времени одного запроса по всем span внутри блока
+        (включая потоки, запущенные через contextvars.copy_context).
+        """
+        if not self.enabled or _request_timings.get() is not None:
+            yield _request_timings.get() if self.enabled else {}
+            return
+        timings = {}
+        token = _request_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _request_timings.reset(token)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {
+                    name: {
+                        "count": h.count,
+                        "sum": round(h.sum, 3),
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for name, h in self._histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric = _prom_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, h in sorted(self._histograms.items()):
+                metric = _prom_name(name)
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum {round(h.sum, 3)}")
+                lines.append(f"{metric}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def log_json(self, logger):
+        """Одна строка JSON со снимком метрик — для экспорта через логи."""
+        logger.info("metrics %s", json.dumps(self.to_json(), ensure_ascii=False))
+
+
+def _prom_name(name: str) -> str:
+    return "lot_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+METRICS = Metrics(enabled=os.getenv("LOT_METRICS", "1") == "1")
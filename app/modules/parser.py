@@ -1,48 +1,235 @@
 # app/modules/parser.py
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from PIL import Image
-import io
-import time
-import requests
+# selenium и webdriver_manager импортируются внутри функций:
+# модуль не должен замедлять запуск приложения, если парсинг не используется
+import functools
+import hashlib
 import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import METRICS
+from .preprocess import load_image
 
 logger = logging.getLogger(__name__)
 
+# Сайт определяется по домену; для локальных HTML-фикстур передаётся явно (site=...)
+SITES = {"wildberries.ru": "wildberries", "ozon.ru": "ozon"}
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36"
+# Куда сохранять HTML страниц, которые не удалось разобрать; пустая строка — не сохранять
+DEBUG_DIR = os.getenv("LOT_PARSER_DEBUG_DIR", "./data/parser_debug")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _chromedriver_path() -> str:
+    # install() проверяет версию по сети — один раз на процесс, а не на каждый драйвер
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager(driver_version="142.0.7444.175").install()
+
+
 def get_selenium_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     options = Options()
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
     options.add_argument("--disable-images")  # ускоряет загрузку
+    # get() возвращается после DOMContentLoaded; готовность элементов — явными ожиданиями
+    options.page_load_strategy = "eager"
     options.binary_location = "/usr/bin/chromium"
-    service = Service(ChromeDriverManager(driver_version="142.0.7444.175").install())  # без указания версии
+    service = Service(_chromedriver_path())
     return webdriver.Chrome(service=service, options=options)
 
-def parse_marketplace(url: str):
-    if "wildberries.ru" not in url and "ozon.ru" not in url:
-        raise ValueError("Поддерживаются только wildberries.ru и ozon.ru")
 
-    driver = get_selenium_driver()
+def _http_session() -> requests.Session:
+    """Общая сессия с пулом соединений для скачивания изображений."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def _dump_debug_page(driver, site: str):
+    """
+    Для отладки: HTML страницы, на которой не нашлось название, — отдельный
+    файл на каждую ссылку в DEBUG_DIR (в пакетном режиме потоки не пишут в один файл).
+    Ошибка записи только логируется: она не должна подменять ошибку разбора.
+    """
+    if not DEBUG_DIR:
+        return
     try:
-        driver.get(url)
-        time.sleep(5)  # даём время на полную загрузку
+        url = driver.current_url
+        name = f"{site}_{hashlib.blake2b(url.encode('utf-8'), digest_size=6).hexdigest()}.html"
+        os.makedirs(DEBUG_DIR, exist_ok=True)
+        with open(os.path.join(DEBUG_DIR, name), "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+        logger.info("Saved page %s to %s", url, name)
+    except Exception as e:
+        logger.warning("Failed to save debug page: %s", e)
+
+
+def detect_site(url: str) -> str:
+    for domain, site in SITES.items():
+        if domain in url:
+            return site
+    raise ValueError("Поддерживаются только wildberries.ru и ozon.ru")
+
+
+class DriverPool:
+    """
+    Пул долгоживущих headless-драйверов: браузер запускается один раз
+    и обслуживает много страниц. Драйверы создаются по требованию, не больше size.
+    Драйвер, упавший с ошибкой браузера, закрывается, а его слот освобождается —
+    следующий запрос запустит новый; ошибки разбора страницы (RuntimeError)
+    драйвер не выбраковывают. Ожидание свободного драйвера — не дольше acquire_timeout.
+    """
+
+    def __init__(self, size: int = 2, factory=get_selenium_driver, acquire_timeout: float = 300):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        # Слот — право держать один драйвер в работе; возвращается и с драйвером,
+        # и при его выбраковке, поэтому ожидающие не зависят от упавших браузеров
+        self._slots = threading.BoundedSemaphore(size)
 
-        if "wildberries.ru" in url:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No browser driver became free within {self.acquire_timeout} s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        # Свободный слот без простаивающего драйвера: первый запуск или замена выбракованного
+        try:
+            with METRICS.span("parser.driver_start"):
+                return self._factory()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, driver):
+        self._idle.put(driver)
+        self._slots.release()
+
+    def _discard(self, driver):
+        try:
+            self._quit(driver)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning("Failed to quit broken driver: %s", e)
+
+    @contextmanager
+    def driver(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        except RuntimeError:
+            self._release(driver)
+            raise
+        except BaseException:
+            self._discard(driver)
+            raise
+        else:
+            self._release(driver)
+
+    def close(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+
+def _parse_page(driver, url: str, site: str):
+    with METRICS.span("parser.page"):
+        driver.get(url)
+        if site == "wildberries":
             return _parse_wildberries(driver)
-        elif "ozon.ru" in url:
-            return _parse_ozon(driver)
+        return _parse_ozon(driver)
+
+
+def parse_marketplace(url: str, site: str = None, pool: DriverPool = None):
+    """
+    (image, title) товара по ссылке. site — "wildberries" | "ozon",
+    по умолчанию определяется по домену. С pool драйвер берётся из пула,
+    иначе запускается и закрывается отдельный браузер.
+    """
+    site = site or detect_site(url)
+    if pool is not None:
+        with pool.driver() as driver:
+            return _parse_page(driver, url, site)
+
+    driver = get_selenium_driver()
+    try:
+        return _parse_page(driver, url, site)
     finally:
         driver.quit()
 
+
+def parse_marketplace_bulk(urls, workers: int = 4, site: str = None):
+    """
+    Разбирает список ссылок пулом из workers браузеров. Отдаёт
+    (url, image, title, error) по мере готовности, а не в порядке urls;
+    ошибка одной ссылки не прерывает остальные.
+    """
+    with DriverPool(size=workers) as pool, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as executor:
+        futures = {executor.submit(parse_marketplace, url, site, pool): url for url in urls}
+        try:
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    image, title = future.result()
+                except Exception as e:
+                    METRICS.inc("parser.errors")
+                    yield url, None, None, f"{type(e).__name__}: {e}"
+                else:
+                    METRICS.inc("parser.pages")
+                    yield url, image, title, None
+        finally:
+            # Генератор закрыли досрочно — не запускаем оставшиеся страницы
+            for future in futures:
+                future.cancel()
+
 def _parse_wildberries(driver):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     wait = WebDriverWait(driver, 20)  # увеличьте таймаут
 
     # 🔹 Название: ищем <h3>, содержащий "productTitle" в class
@@ -58,9 +245,7 @@ def _parse_wildberries(driver):
             )
             title = title_elem.text.strip()
     except Exception as e:
-        # Для отладки: сохраните HTML
-        with open("/app/wb_debug.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
+        _dump_debug_page(driver, "wildberries")
         raise RuntimeError(f"Не удалось найти название на Wildberries: {str(e)}")
 
     # 🔹 Изображение: ищем <img> внутри блока с "imgContainer"
@@ -77,6 +262,10 @@ def _parse_wildberries(driver):
     return _download_image(img_url, title)
 
 def _parse_ozon(driver):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     wait = WebDriverWait(driver, 20)
 
     try:
@@ -85,8 +274,7 @@ def _parse_ozon(driver):
         )
         title = title_elem.text.strip()
     except Exception as e:
-        with open("/app/ozon_debug.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
+        _dump_debug_page(driver, "ozon")
         raise RuntimeError(f"Не удалось найти название на Ozon: {str(e)}")
 
     try:
@@ -111,9 +299,9 @@ def _download_image(img_url: str, title: str):
     if img_url.endswith(".webp"):
         img_url = img_url.replace(".webp", ".jpg")
 
-    headers = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36"}
-    response = requests.get(img_url, headers=headers, timeout=10)
-    response.raise_for_status()
+    with METRICS.span("parser.image"):
+        response = _http_session().get(img_url, timeout=10)
+        response.raise_for_status()
 
-    image = Image.open(io.BytesIO(response.content)).convert("RGB")
+    image = load_image(response.content)
     return image, title
\ No newline at end of file
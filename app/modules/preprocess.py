@@ -0,0 +1,62 @@
+# app/modules/preprocess.py
+#
+# Общая предобработка изображений лотов: одно декодирование с ограничением
+# размера и общий уменьшенный вариант для классификаторов.
+#
+# YOLO сам приводит изображение к 640 px по длинной стороне, CLIP и AI-детектор —
+# к 224 px по короткой. Поэтому фото 4000x3000 не нужно декодировать целиком:
+# JPEG декодируется в draft-режиме (масштабирование DCT 1/2..1/8 прямо в декодере)
+# до ближайшего размера не меньше MAX_SIDE, остальное досжимает thumbnail.
+
+import io
+import os
+
+from PIL import Image
+
+# Длинная сторона декодированного изображения: запас над 640 px YOLO
+# для отрисовки рамок в интерфейсе
+MAX_SIDE = int(os.getenv("LOT_MAX_IMAGE_SIDE", "1280"))
+# Короткая сторона общего варианта для CLIP и AI-детектора (их вход — 224 px)
+CLASSIFIER_SIDE = 256
+# Больше — отказ: PNG/WebP такого размера декодируются только целиком
+MAX_DECODE_PIXELS = int(os.getenv("LOT_MAX_DECODE_PIXELS", str(64 * 2**20)))
+# Входит в версию моделей ResultCache: смена предобработки меняет эмбеддинги
+PREPROCESS_VERSION = f"max{MAX_SIDE}-cls{CLASSIFIER_SIDE}"
+
+
+def load_image(source, max_side: int = MAX_SIDE) -> Image.Image:
+    """
+    Декодирует изображение (путь, bytes или файловый объект) в RGB
+    с длинной стороной не больше max_side. Рамки YOLO и ключи ResultCache
+    относятся к этому, уже уменьшенному изображению.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    width, height = image.size
+    if width * height > MAX_DECODE_PIXELS and image.format != "JPEG":
+        raise ValueError(
+            f"Image {width}x{height} exceeds {MAX_DECODE_PIXELS} pixels and cannot be decoded reduced"
+        )
+    if image.format == "JPEG":
+        # Сразу RGB: без промежуточной копии в convert
+        image.draft("RGB", (max_side, max_side))
+    image = image.convert("RGB")
+    if max(image.size) > max_side:
+        # reducing_gap: сначала целочисленное уменьшение (reduce), затем точный ресемплинг
+        image.thumbnail((max_side, max_side), Image.BICUBIC, reducing_gap=2.0)
+    return image
+
+
+def classifier_view(image: Image.Image, side: int = CLASSIFIER_SIDE) -> Image.Image:
+    """
+    Вариант для CLIP и AI-детектора: короткая сторона side. Считается
+    один раз на изображение и передаётся обеим моделям — их процессоры
+    делают только финальный ресайз 256 -> 224 вместо полноразмерного.
+    """
+    width, height = image.size
+    scale = side / min(width, height)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.BICUBIC, reducing_gap=2.0)
@@ -1,29 +1,135 @@
 # app/modules/rag_llm.py
 import requests
+import hashlib
 import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from .metrics import METRICS
+from .result_cache import ResultCache
+
+# Меняется при правке промпта — инвалидирует кэш отчётов
+PROMPT_VERSION = "v1"
+
+
+def render_template_report(analysis_result: dict) -> str:
+    """Структурированный отчёт без LLM для однозначных случаев."""
+    ai = analysis_result['ai_detection']
+    risk = analysis_result['risk_level']
+    signs = []
+    if ai['is_ai_generated']:
+        signs.append(f"изображение похоже на сгенерированное ИИ (вероятность {ai['ai_score']:.2f})")
+    if analysis_result.get('has_forbidden'):
+        signs.append("на фото есть объекты, нетипичные для категории товара")
+    # None — стадия пропущена каскадом LotAnalyzer
+    if analysis_result['similarity_score'] is not None and analysis_result['similarity_score'] < 0.4:
+        signs.append(f"описание слабо соответствует фото (сходство {analysis_result['similarity_score']:.2f})")
+    duplicates = analysis_result.get('duplicate_images')
+    if duplicates and duplicates['matches']:
+        signs.append(f"это же фото используется в других лотах (всего лотов с фото: {duplicates['cluster_size']})")
+
+    if risk == "высокий":
+        summary = "Лот имеет выраженные признаки мошенничества."
+        advice = "Не вносите предоплату, запросите у продавца дополнительные фото и проверьте его историю."
+    elif risk == "средний":
+        summary = "Лот требует дополнительной проверки."
+        advice = "Уточните у продавца детали товара и сравните фото с другими предложениями."
+    else:
+        summary = "Существенных признаков мошенничества не обнаружено."
+        advice = "Лот можно рассматривать к покупке; используйте безопасную сделку маркетплейса."
+
+    objects = ', '.join(analysis_result['detected_objects']) or "не обнаружены"
+    lines = [
+        "**1. Краткое заключение**",
+        f"{summary} Уровень риска: {risk}. Объекты на фото: {objects}.",
+        "",
+        "**2. Признаки риска**",
+    ]
+    lines += [f"- {sign}" for sign in signs] or ["- не выявлены"]
+    lines += ["", "**3. Рекомендации покупателю**", advice, "", "**4. Похожие случаи**"]
+    lines += [
+        f"- {case['description']} (риск: {case['risk_level']})"
+        for case in analysis_result['rag_context']
+    ] or ["- не найдены"]
+    return "\n".join(lines)
+
 
 class RAGLLM:
-    def __init__(self):
-        self.ollama_url = "http://ollama:11434/api/generate"
-        self.model = "qwen:4b"  # 4-bit квантованная версия для RTX 3050
-        
-    def generate_report(self, analysis_result: dict, user_text: str) -> str:
-        """Генерирует текстовый отчет с помощью LLM"""
-        # Формируем контекст для LLM
+    def __init__(self, ollama_url: str = None, model: str = "qwen:4b",
+                 max_concurrency: int = 2, timeout: int = 300,
+                 report_cache_path: str = None, template_risk_levels=("низкий",)):
+        # OLLAMA_HOST задаётся в docker-compose.yml
+        self.ollama_url = ollama_url or f"http://{os.getenv('OLLAMA_HOST', 'ollama:11434')}/api/generate"
+        self.model = model  # 4-bit квантованная версия для RTX 3050
+        self.timeout = timeout
+
+        # Одна сессия на процесс: keep-alive соединения к Ollama переиспользуются.
+        # Клиент синхронный намеренно: Streamlit и batch_runner работают в потоках,
+        # а service.py (aiohttp — только его HTTP-сервер) вызывает generate_report
+        # в своём пуле потоков, так что асинхронный клиент Ollama ничего бы не дал
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_concurrency, 1) * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Не больше max_concurrency одновременных генераций — Ollama на одной GPU
+        # всё равно обрабатывает их по очереди, лишние запросы только ждут в таймауте
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        # Последние замеры: время до первого токена и полное время отчёта, мс
+        self._metrics = deque(maxlen=1000)
+        self._metrics_lock = threading.Lock()
+
+        # LLM вызывается только там, где даёт пользу: уже встречавшийся контекст
+        # берётся из кэша, а для уровней риска из template_risk_levels
+        # отчёт собирается по шаблону. Смена модели или промпта сбрасывает кэш.
+        self.report_cache = (
+            ResultCache(path=report_cache_path, model_version=f"{model}|{PROMPT_VERSION}")
+            if report_cache_path else None
+        )
+        self.template_risk_levels = tuple(template_risk_levels)
+        self.report_sources = Counter()
+
+    def _build_context(self, analysis_result: dict) -> str:
+        # Формируем контекст для LLM; стадии, пропущенные каскадом, помечаются «не проверялось»
+        similarity = analysis_result['similarity_score']
+        similarity_text = f"{similarity:.2f}" if similarity is not None else "не проверялось"
+        ai = analysis_result['ai_detection']
+        ai_text = (
+            f"{'Да' if ai['is_ai_generated'] else 'Нет'} (вероятность: {ai['ai_score']:.2f})"
+            if ai['ai_score'] is not None else "не проверялся"
+        )
         context = f"""
 Анализ лота #{analysis_result['lot_id']}:
 - Обнаруженные объекты: {', '.join(analysis_result['detected_objects'])}
-- Сходство изображения и текста: {analysis_result['similarity_score']:.2f}
-- Риск ИИ-генерации: {'Да' if analysis_result['ai_detection']['is_ai_generated'] else 'Нет'} (вероятность: {analysis_result['ai_detection']['ai_score']:.2f})
+- Сходство изображения и текста: {similarity_text}
+- Риск ИИ-генерации: {ai_text}
 - Уровень риска: {analysis_result['risk_level'].upper()}
-        
-Похожие случаи из базы знаний:
 """
+        duplicates = analysis_result.get('duplicate_images')
+        if duplicates and duplicates['matches']:
+            context += f"- Фото повторяется в других лотах: всего {duplicates['cluster_size']} лотов с этим фото\n"
+        context += "\nПохожие случаи из базы знаний:\n"
         for i, case in enumerate(analysis_result['rag_context'], 1):
             context += f"{i}. {case['description']} - Риск: {case['risk_level']}\n"
-        
+        return context
+
+    @staticmethod
+    def _context_key(context: str) -> str:
+        """Ключ кэша: контекст без номера лота и без различий в пробелах."""
+        lines = [
+            " ".join(line.split()) for line in context.splitlines()
+            if line.strip() and not line.startswith("Анализ лота #")
+        ]
+        return "rep:" + hashlib.blake2b("\n".join(lines).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _build_prompt(self, context: str) -> str:
         # Формируем запрос к LLM
-        prompt = f"""
+        return f"""
 Ты — эксперт по анализу мошенничества на маркетплейсах. На основе следующих данных сформируй структурированный отчет для покупателя:
 
 {context}
@@ -36,24 +142,128 @@ class RAGLLM:
 
 Пиши на русском языке, используй формальный стиль, но понятный для обычного пользователя.
 """
-        
-        try:
-            # Запрос к Ollama
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"temperature": 0.3}
-                },
-                timeout=300
-            )
-            
-            if response.status_code == 200:
-                return response.json()["response"]
-            else:
-                return f"Ошибка генерации отчёта: {response.text}"
-                
-        except Exception as e:
-            return f"Не удалось подключиться к LLM: {str(e)}. Используйте локальный режим анализа."
+
+    def stream_report(self, analysis_result: dict, user_text: str, metrics: dict = None):
+        """
+        Генерирует отчёт потоково: отдаёт фрагменты текста по мере их прихода от Ollama.
+        Если передан metrics, в него записываются ttft_ms, total_ms и source
+        (llm, cache или template).
+        """
+        start = time.perf_counter()
+        context = self._build_context(analysis_result)
+        key = self._context_key(context)
+
+        report, source = None, "llm"
+        if self.report_cache is not None:
+            cached = self.report_cache.get(key)
+            if cached is not None:
+                report, source = cached["report"], "cache"
+        if report is None and analysis_result['risk_level'] in self.template_risk_levels:
+            report, source = render_template_report(analysis_result), "template"
+        if report is not None:
+            yield report
+            self._record(start, None, source, metrics)
+            return
+
+        prompt = self._build_prompt(context)
+        ttft_ms = None
+        parts = []
+        completed = False
+
+        with self._slots:
+            try:
+                # Запрос к Ollama
+                with self.session.post(
+                    self.ollama_url,
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": True,
+                        "options": {"temperature": 0.3}
+                    },
+                    timeout=self.timeout,
+                    stream=True
+                ) as response:
+                    if response.status_code != 200:
+                        yield f"Ошибка генерации отчёта: {response.text}"
+                        return
+
+                    # Ollama отвечает NDJSON: {"response": "...", "done": false} на строку
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            yield f"Ошибка генерации отчёта: {chunk['error']}"
+                            return
+                        token = chunk.get("response", "")
+                        if token:
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - start) * 1000
+                            parts.append(token)
+                            yield token
+                        if chunk.get("done"):
+                            completed = True
+                            break
+
+            except Exception as e:
+                yield f"Не удалось подключиться к LLM: {str(e)}. Используйте локальный режим анализа."
+                return
+
+        # В кэш попадают только полностью сгенерированные отчёты
+        if completed and self.report_cache is not None:
+            self.report_cache.put(key, {"report": "".join(parts)})
+        self._record(start, ttft_ms, source, metrics)
+
+    def _record(self, start: float, ttft_ms, source: str, metrics: dict = None):
+        total_ms = (time.perf_counter() - start) * 1000
+        sample = {
+            "ttft_ms": round(ttft_ms if ttft_ms is not None else total_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "source": source,
+        }
+        with self._metrics_lock:
+            self._metrics.append(sample)
+            self.report_sources[source] += 1
+        METRICS.inc(f"llm.reports.{source}")
+        METRICS.observe("llm.ttft.ms", sample["ttft_ms"])
+        METRICS.observe("llm.total.ms", sample["total_ms"])
+        if metrics is not None:
+            metrics.update(sample)
+
+    def generate_report(self, analysis_result: dict, user_text: str, metrics: dict = None) -> str:
+        """Генерирует текстовый отчет с помощью LLM"""
+        return "".join(self.stream_report(analysis_result, user_text, metrics=metrics))
+
+    def generate_reports(self, items: list, max_workers: int = None) -> list:
+        """
+        Пакетная генерация: items — список пар (analysis_result, user_text).
+        Запросы идут параллельно в пределах max_concurrency, порядок сохраняется.
+        """
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_concurrency) as pool:
+            return list(pool.map(lambda item: self.generate_report(*item), items))
+
+    def latency_stats(self) -> dict:
+        """Медианы и p95 по последним отчётам, мс."""
+        with self._metrics_lock:
+            samples = list(self._metrics)
+            sources = dict(self.report_sources)
+        if not samples:
+            return {"reports": 0, "sources": sources}
+
+        def pct(values, q):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        ttft = [s["ttft_ms"] for s in samples]
+        total = [s["total_ms"] for s in samples]
+        return {
+            "reports": len(samples),
+            "ttft_p50_ms": pct(ttft, 0.5),
+            "ttft_p95_ms": pct(ttft, 0.95),
+            "total_p50_ms": pct(total, 0.5),
+            "total_p95_ms": pct(total, 0.95),
+            "sources": sources,
+        }
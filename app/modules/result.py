@@ -0,0 +1,148 @@
+# app/modules/result.py
+#
+# Компактный результат анализа лота. Вместо объекта ultralytics (тензоры,
+# исходное изображение, тайминги) хранит только рамки float32 (n x 4),
+# id классов, уверенности и поля вердикта. Поддерживает доступ как к словарю
+# (result["risk_level"], result.get(...), dict(result)), поэтому main.py и RAGLLM
+# работают с ним без изменений.
+#
+# Сериализация: to_dict()/to_json() — прежний JSON-вид результата;
+# to_bytes()/from_bytes() — JSON-заголовок и сырые массивы, при чтении
+# массивы не копируются.
+
+import json
+import struct
+import sys
+
+import numpy as np
+
+# Поля вердикта: сериализуются как JSON, в памяти — обычные атрибуты
+FIELDS = (
+    "lot_id", "similarity_score", "ai_detection", "risk_level", "rag_context", "from_cache",
+    "category", "category_source", "zero_shot", "has_forbidden", "duplicate_images",
+    "forbidden_objects", "cascade", "timings",
+)
+# Ключи, которые вычисляются из массивов детекций
+DERIVED = ("detected_objects", "detections", "yolo_results")
+
+# Бинарный формат: magic, длина JSON-заголовка, заголовок, затем сырые
+# массивы boxes (float32), class_ids (int16), scores (float32)
+_MAGIC = b"LOTR1"
+_PREFIX = struct.Struct("<5sI")
+
+
+class LotResult:
+    __slots__ = FIELDS + ("boxes", "class_ids", "scores", "labels")
+
+    def __init__(self, boxes, class_ids, scores, labels, **fields):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids, dtype=np.int16)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        # Метки — общие интернированные строки, а не копии на каждый результат
+        self.labels = tuple(sys.intern(label) for label in labels)
+        for name in FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_detections(cls, detections: list, **fields):
+        """Из компактных детекций ({"label", "box", "score", "class_id"}), как в ResultCache."""
+        return cls(
+            [det["box"] for det in detections],
+            [det.get("class_id", -1) for det in detections],
+            [det["score"] for det in detections],
+            [det["label"] for det in detections],
+            **fields,
+        )
+
+    # --- доступ как к словарю ---
+
+    def keys(self):
+        return FIELDS + DERIVED[:2]
+
+    def __getitem__(self, key: str):
+        if key == "detected_objects":
+            return list(self.labels)
+        if key == "detections":
+            return [
+                {"label": label, "box": [round(v, 1) for v in box], "score": round(score, 3), "class_id": class_id}
+                for label, box, score, class_id in zip(
+                    self.labels, self.boxes.tolist(), self.scores.tolist(), self.class_ids.tolist()
+                )
+            ]
+        if key == "yolo_results":
+            return None
+        if key in FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return key in FIELDS or key in DERIVED
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self) -> dict:
+        """JSON-совместимый словарь того же вида, что раньше возвращал analyze_lot."""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"LotResult(lot_id={self.lot_id!r}, risk_level={self.risk_level!r}, detections={len(self.labels)})"
+
+    # --- сериализация ---
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload):
+        data = json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+        return cls.from_detections(data.get("detections") or [], **{name: data.get(name) for name in FIELDS})
+
+    def to_buffers(self) -> list:
+        """
+        Буферы бинарной формы без копирования массивов: их можно отдать
+        в socket.sendmsg / writelines. b"".join(...) даёт to_bytes().
+        """
+        header = json.dumps(
+            {"n": len(self.labels), "labels": self.labels, **{name: getattr(self, name) for name in FIELDS}},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        return [
+            _PREFIX.pack(_MAGIC, len(header)), header,
+            memoryview(np.ascontiguousarray(self.boxes)).cast("B"),
+            memoryview(np.ascontiguousarray(self.class_ids)).cast("B"),
+            memoryview(np.ascontiguousarray(self.scores)).cast("B"),
+        ]
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.to_buffers())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Массивы — представления над data (np.frombuffer), без копирования."""
+        buffer = memoryview(data)
+        magic, header_len = _PREFIX.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a LotResult buffer (magic {magic!r})")
+        offset = _PREFIX.size
+        header = json.loads(bytes(buffer[offset:offset + header_len]))
+        offset += header_len
+        n = header["n"]
+        boxes = np.frombuffer(buffer, dtype=np.float32, count=n * 4, offset=offset).reshape(n, 4)
+        offset += boxes.nbytes
+        class_ids = np.frombuffer(buffer, dtype=np.int16, count=n, offset=offset)
+        offset += class_ids.nbytes
+        scores = np.frombuffer(buffer, dtype=np.float32, count=n, offset=offset)
+
+        result = cls.__new__(cls)
+        result.boxes, result.class_ids, result.scores = boxes, class_ids, scores
+        result.labels = tuple(sys.intern(label) for label in header["labels"])
+        for name in FIELDS:
+            setattr(result, name, header.get(name))
+        return result
@@ -0,0 +1,146 @@
+# app/modules/result_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from PIL import Image
+
+
+def normalize_text(text: str) -> str:
+    """Регистр и пробелы не влияют на эмбеддинг CLIP, поэтому не влияют и на ключ."""
+    return " ".join(text.lower().split())
+
+
+def image_key(image: Image.Image) -> str:
+    """
+    Ключ по содержимому: хэш пикселей декодированного изображения.
+    Повторная загрузка того же фото даёт тот же ключ независимо от имени файла.
+    Перцептивный хэш здесь не подходит: для пережатой/уменьшенной копии
+    закэшированные рамки YOLO были бы в чужих координатах.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    h.update(image.tobytes())
+    return "img:" + h.hexdigest()
+
+
+def text_key(text: str) -> str:
+    return "txt:" + hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def lot_fingerprint(image: Image.Image, text: str) -> str:
+    """Стабильный между процессами идентификатор пары фото+описание (в отличие от hash())."""
+    return hashlib.blake2b(
+        (image_key(image) + text_key(text)).encode(), digest_size=8
+    ).hexdigest()
+
+
+class ResultCache:
+    """
+    Персистентный кэш результатов моделей (SQLite) с вытеснением LRU.
+    По ключу изображения хранятся детекции YOLO, ответ AI-детектора и
+    CLIP-эмбеддинг изображения, по ключу текста — CLIP-эмбеддинг текста.
+    При смене model_version все записи сбрасываются.
+    """
+
+    def __init__(self, path: str = "./data/cache/results.sqlite3", max_entries: int = 50000,
+                 model_version: str = "", touch_batch: int = 256):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.model_version = model_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'model_version'").fetchone()
+            if row is None or row[0] != model_version:
+                # Модели обновились — старые детекции и эмбеддинги недействительны
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('model_version', ?)",
+                    (model_version,)
+                )
+            # Число записей — в памяти: put не считает таблицу заново
+            self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        # Отметки last_used от попаданий копятся и пишутся одним executemany
+        self._touched = {}
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+            return json.loads(row[0])
+
+    def put(self, key: str, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock, self._conn:
+            now = time.time()
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO entries (key, payload, last_used) VALUES (?, ?, ?)", (key, data, now)
+            ).rowcount
+            if inserted:
+                self._count += 1
+            else:
+                self._conn.execute("UPDATE entries SET payload = ?, last_used = ? WHERE key = ?", (data, now, key))
+            self._touched.pop(key, None)
+            if self._count > self.max_entries:
+                # Перед вытеснением порядок LRU должен учитывать все попадания
+                self._flush_touched()
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                    (self._count - self.max_entries,)
+                )
+                self._count = self.max_entries
+
+    def _flush_touched(self):
+        """Записывает накопленные last_used (вызывается под self._lock)."""
+        if not self._touched:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+        self._touched.clear()
+
+    def flush(self):
+        """Сохраняет отметки последнего использования, ещё не записанные в базу."""
+        with self._lock:
+            self._flush_touched()
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._count = 0
+            self._touched.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._count
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "model_version": self.model_version,
+        }
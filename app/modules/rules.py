@@ -0,0 +1,165 @@
+# app/modules/rules.py
+#
+# Правила категоризации и запрещённых объектов, загружаемые из config/rules.json.
+# Ключевые слова всех категорий компилируются в один автомат Ахо-Корасик:
+# текст просматривается один раз независимо от числа категорий и слов.
+
+import json
+import os
+
+import numpy as np
+
+RULES_PATH = os.getenv(
+    "LOT_RULES", os.path.join(os.path.dirname(__file__), "..", "config", "rules.json")
+)
+# Индекс в этом кортеже — числовой код уровня риска в evaluate_batch
+RISK_LEVELS = ("низкий", "средний", "высокий")
+
+
+class KeywordMatcher:
+    """
+    Автомат Ахо-Корасик для поиска подстрок. Каждому ключевому слову
+    соответствует приоритет (индекс категории); match возвращает наименьший
+    приоритет среди всех вхождений — как цепочка if/elif по категориям.
+    """
+
+    def __init__(self, keywords):
+        # keywords — пары (слово, приоритет)
+        self._goto = [{}]
+        self._best = [None]
+        for word, priority in keywords:
+            if not word:
+                continue
+            node = 0
+            for char in word:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._best.append(None)
+                node = nxt
+            if self._best[node] is None or priority < self._best[node]:
+                self._best[node] = priority
+        self._build_failure_links()
+        # Лучший возможный приоритет: при его нахождении поиск можно прекратить
+        self._min_priority = min((p for p in self._best if p is not None), default=None)
+
+    def _build_failure_links(self):
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                fail = self._goto[state].get(char, 0)
+                self._fail[child] = fail if fail != child else 0
+                # Слова, оканчивающиеся в fail-узле, тоже оканчиваются здесь
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def match(self, text: str):
+        """Наименьший приоритет среди найденных слов или None."""
+        goto, fail, best_of = self._goto, self._fail, self._best
+        node, best = 0, None
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found = best_of[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == self._min_priority:
+                    break
+        return best
+
+
+class RuleEngine:
+    """
+    Категория по ключевым словам описания, запрещённые для категории объекты
+    и итоговый уровень риска. Порядок категорий в файле правил — приоритет:
+    при совпадении слов нескольких категорий побеждает первая.
+    """
+
+    def __init__(self, categories: list, default_category: str = "другое",
+                 high_risk_similarity: float = 0.2, medium_risk_similarity: float = 0.4):
+        self.categories = [c["name"] for c in categories]
+        self.default_category = default_category
+        self.high_risk_similarity = high_risk_similarity
+        self.medium_risk_similarity = medium_risk_similarity
+        self._matcher = KeywordMatcher(
+            (keyword.lower(), priority)
+            for priority, category in enumerate(categories)
+            for keyword in category.get("keywords", [])
+        )
+        # Списки — для вывода в отчёт, множества — для проверки пересечения
+        self._forbidden_lists = {c["name"]: list(c.get("forbidden_objects", [])) for c in categories}
+        self._forbidden_sets = {name: frozenset(objs) for name, objs in self._forbidden_lists.items()}
+
+    @classmethod
+    def from_file(cls, path: str = RULES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        thresholds = config.get("thresholds", {})
+        return cls(
+            config["categories"],
+            default_category=config.get("default_category", "другое"),
+            high_risk_similarity=thresholds.get("high_risk_similarity", 0.2),
+            medium_risk_similarity=thresholds.get("medium_risk_similarity", 0.4),
+        )
+
+    def categorize(self, text: str) -> str:
+        priority = self._matcher.match(text.lower())
+        return self.default_category if priority is None else self.categories[priority]
+
+    def forbidden_objects(self, category: str) -> list:
+        return self._forbidden_lists.get(category, [])
+
+    def has_forbidden(self, category: str, detected_objects) -> bool:
+        forbidden = self._forbidden_sets.get(category)
+        return bool(forbidden) and not forbidden.isdisjoint(detected_objects)
+
+    def is_high_risk(self, category: str = None, detected_objects=None, ai_result: dict = None,
+                     similarity: float = None) -> bool:
+        """
+        Определяют ли уже известные сигналы «высокий» риск при любых остальных.
+        None — сигнал ещё не получен (для каскада в LotAnalyzer); category=None —
+        категория ещё может измениться, запрещённые объекты не проверяются.
+        Условия те же, что в evaluate_batch.
+        """
+        return bool(
+            (ai_result is not None and ai_result["is_ai_generated"])
+            or (similarity is not None and similarity < self.high_risk_similarity)
+            or (category is not None and detected_objects is not None
+                and self.has_forbidden(category, detected_objects))
+        )
+
+    def evaluate(self, text: str, detected_objects: list, ai_result: dict, similarity: float):
+        """(категория, запрещённые объекты, есть ли они на фото, уровень риска) для одного лота."""
+        return self.evaluate_batch([text], [detected_objects], [ai_result], [similarity])[0]
+
+    def evaluate_batch(self, texts: list, detected: list, ai_results: list, similarities: list,
+                       categories: list = None) -> list:
+        """
+        Правила для пакета лотов. Категории и пересечения с запрещёнными
+        классами считаются по лотам, уровни риска — одним векторным проходом.
+        categories — уже определённые категории (иначе — по ключевым словам texts).
+        """
+        if categories is None:
+            categories = [self.categorize(text) for text in texts]
+        has_forbidden = np.fromiter(
+            (self.has_forbidden(c, objs) for c, objs in zip(categories, detected)),
+            dtype=bool, count=len(texts)
+        )
+        is_ai = np.fromiter((r["is_ai_generated"] for r in ai_results), dtype=bool, count=len(texts))
+        sims = np.asarray(similarities, dtype=np.float64)
+
+        risk = np.where(sims < self.medium_risk_similarity, 1, 0)
+        risk[is_ai | (sims < self.high_risk_similarity) | has_forbidden] = 2
+        return [
+            (category, self.forbidden_objects(category), bool(forbidden), RISK_LEVELS[code])
+            for category, forbidden, code in zip(categories, has_forbidden.tolist(), risk.tolist())
+        ]
@@ -0,0 +1,77 @@
+# app/modules/startup.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Время загрузки компонентов: импорты, модели, прогрев. Один на процесс."""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, component: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._timings[component] = round(elapsed_ms, 1)
+
+    def report(self) -> dict:
+        """{компонент: мс} в порядке загрузки плюс время с запуска процесса."""
+        with self._lock:
+            report = dict(self._timings)
+        report["since_start"] = round((time.perf_counter() - self._started) * 1000, 1)
+        return report
+
+
+PROFILER = StartupProfiler()
+
+
+class LazyComponent:
+    """
+    Компонент, создаваемый при первом обращении. Фабрика вызывается
+    ровно один раз, даже если к компоненту одновременно обращаются
+    прогрев в фоне и первый запрос пользователя.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    with PROFILER.timed(f"load:{self.name}"):
+                        self._value = self._factory()
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+def warm_up(analyzer, background: bool = True):
+    """
+    Загружает модели анализатора и прогоняет через каждую фиктивный вход,
+    чтобы первый реальный лот не платил за ленивую инициализацию
+    (выделение памяти, CUDA-контекст, первые вызовы ядер).
+    """
+    if not background:
+        analyzer.warm_up()
+        return None
+    thread = threading.Thread(target=analyzer.warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -1,46 +1,248 @@
 # app/modules/vector_db.py
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+from .encoder import ClipEncoder
+from .metrics import METRICS
+from .startup import PROFILER
+import logging
 import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Параметры HNSW коллекций. M и construction_ef задают граф и применяются
+# только при создании коллекции; search_ef — ширина поиска (точность против задержки).
+# Коллекции, созданные без этих ключей, работают с умолчаниями Chroma.
+HNSW_DEFAULTS = {
+    "hnsw:space": "cosine",
+    "hnsw:M": int(os.getenv("LOT_HNSW_M", "16")),
+    "hnsw:construction_ef": int(os.getenv("LOT_HNSW_CONSTRUCTION_EF", "100")),
+    "hnsw:search_ef": int(os.getenv("LOT_HNSW_SEARCH_EF", "100")),
+}
+
+
+def make_where(risk_levels=None, category: str = None):
+    """Фильтр Chroma по метаданным: уровни риска и/или категория; None — без фильтра."""
+    clauses = []
+    if risk_levels:
+        clauses.append({"risk_level": {"$in": list(risk_levels)}})
+    if category:
+        clauses.append({"category": category})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 
 class VectorDB:
-    def __init__(self, persist_dir="./data/chroma_db"):
+    def __init__(self, persist_dir="./data/chroma_db", encoder: ClipEncoder = None,
+                 hnsw: dict = None, collection_name: str = "fraud_lots"):
         os.makedirs(persist_dir, exist_ok=True)
-        self.model = SentenceTransformer('clip-ViT-B-32')
+        # Общий с LotAnalyzer энкодер; собственный загружается только при автономном использовании
+        self.encoder = encoder or ClipEncoder()
+        with PROFILER.timed("import:chromadb"):
+            import chromadb
         self.client = chromadb.PersistentClient(path=persist_dir)
+        self.hnsw = dict(HNSW_DEFAULTS, **(hnsw or {}))
         self.collection = self.client.get_or_create_collection(
-            name="fraud_lots",
-            metadata={"hnsw:space": "cosine"}
+            name=collection_name,
+            metadata=self.hnsw
         )
+        # Существующая коллекция сохраняет параметры, с которыми была создана
+        current = self.collection.metadata or {}
+        differs = {key: current.get(key) for key, value in self.hnsw.items() if current.get(key, value) != value}
+        if differs:
+            logger.warning("Collection %s keeps its HNSW params %s; rebuild it to apply %s",
+                           collection_name, differs, {key: self.hnsw[key] for key in differs})
+        # Предел размера одного запроса записи у клиента Chroma
+        self.max_batch_size = self.client.get_max_batch_size()
+        # Индекс id, о которых известно, что они уже в коллекции
+        self._known_ids = set()
+        self.write_stats = {
+            "calls": 0, "lots_requested": 0, "lots_written": 0, "duplicates_skipped": 0,
+            "chunks": 0, "encode_ms": 0.0, "write_ms": 0.0,
+        }
 
-    def add_lot(self, lot_id: str, text: str, detected_objects: list, risk_level: str, verdict: str):
-        doc = f"Описание: {text}. Объекты: {', '.join(detected_objects)}. Уровень риска: {risk_level}. Вердикт: {verdict}"
-        emb = self.model.encode(doc).tolist()
-        try:
-            self.collection.add(
-                ids=[lot_id],
-                embeddings=[emb],
-                documents=[doc],
-                metadatas=[{"risk_level": risk_level, "text": text, "objects": str(detected_objects)}]
-            )
-        except Exception as e:
-            # Лот уже существует — пропускаем
-            pass
-
-    def query_similar(self, query_text: str, top_k=2):
-        query_emb = self.model.encode(query_text).tolist()
-        results = self.collection.query(
-            query_embeddings=[query_emb],
-            n_results=top_k,
-            include=["documents", "metadatas"]
-        )
+    @staticmethod
+    def _make_document(text: str, detected_objects: list, risk_level: str, verdict: str) -> str:
+        return f"Описание: {text}. Объекты: {', '.join(detected_objects)}. Уровень риска: {risk_level}. Вердикт: {verdict}"
+
+    def add_lot(self, lot_id: str, text: str, detected_objects: list, risk_level: str, verdict: str,
+                category: str = ""):
+        self.add_lots([{
+            "lot_id": lot_id,
+            "text": text,
+            "detected_objects": detected_objects,
+            "risk_level": risk_level,
+            "verdict": verdict,
+            "category": category,
+        }])
+
+    def _existing_ids(self, ids: list) -> set:
+        """Какие из ids уже есть в коллекции: сначала индекс в памяти, затем один collection.get."""
+        unknown = [lot_id for lot_id in ids if lot_id not in self._known_ids]
+        if unknown:
+            with METRICS.span("chroma.get"):
+                found = self.collection.get(ids=unknown, include=[])["ids"]
+            self._known_ids.update(found)
+        return {lot_id for lot_id in ids if lot_id in self._known_ids}
+
+    def add_lots(self, lots: list, chunk_size: int = None) -> int:
+        """
+        Пакетная запись: lots — список словарей с ключами
+        lot_id, text, detected_objects, risk_level, verdict и необязательным category.
+        Уже существующие лоты (и повторы внутри пакета) пропускаются до кодирования:
+        как и раньше, в базе остаётся первая запись лота. Новые документы
+        кодируются одним батчем и пишутся через upsert частями по chunk_size.
+        Ошибки записи не подавляются. Возвращает число записанных лотов.
+        """
+        return self.write_encoded(self.encode_lots(lots), chunk_size)
+
+    def encode_lots(self, lots: list) -> list:
+        """
+        Первая половина add_lots: отбор новых лотов и кодирование документов.
+        Возвращает записи {"lot", "document", "embedding"} в порядке lots —
+        их можно учесть в query_similar_batch (pending) до записи write_encoded.
+        """
+        # Повторы id внутри пакета: сохраняется первый
+        unique, seen = [], set()
+        for lot in lots:
+            if lot["lot_id"] not in seen:
+                seen.add(lot["lot_id"])
+                unique.append(lot)
+        if not unique:
+            return []
+
+        existing = self._existing_ids([lot["lot_id"] for lot in unique])
+        new = [lot for lot in unique if lot["lot_id"] not in existing]
+        self.write_stats["calls"] += 1
+        self.write_stats["lots_requested"] += len(lots)
+        self.write_stats["duplicates_skipped"] += len(lots) - len(new)
+        METRICS.inc("chroma.duplicates_skipped", len(lots) - len(new))
+        if not new:
+            return []
+
+        start = time.perf_counter()
+        docs = [
+            self._make_document(lot["text"], lot["detected_objects"], lot["risk_level"], lot["verdict"])
+            for lot in new
+        ]
+        embs = np.asarray(self.encoder.encode_texts(docs), dtype=np.float32)
+        self.write_stats["encode_ms"] += (time.perf_counter() - start) * 1000
+        return [{"lot": lot, "document": doc, "embedding": emb} for lot, doc, emb in zip(new, docs, embs)]
+
+    def write_encoded(self, encoded: list, chunk_size: int = None) -> int:
+        """Вторая половина add_lots: upsert записей encode_lots частями по chunk_size."""
+        if not encoded:
+            return 0
+        start = time.perf_counter()
+        chunk_size = min(chunk_size or self.max_batch_size, self.max_batch_size)
+        for i in range(0, len(encoded), chunk_size):
+            chunk = encoded[i:i + chunk_size]
+            with METRICS.span("chroma.upsert"):
+                self.collection.upsert(
+                    ids=[entry["lot"]["lot_id"] for entry in chunk],
+                    embeddings=[entry["embedding"].tolist() for entry in chunk],
+                    documents=[entry["document"] for entry in chunk],
+                    metadatas=[self._metadata(entry["lot"]) for entry in chunk]
+                )
+            self._known_ids.update(entry["lot"]["lot_id"] for entry in chunk)
+            self.write_stats["chunks"] += 1
+
+        METRICS.observe("chroma.add.batch_size", len(encoded))
+        METRICS.inc("chroma.lots_written", len(encoded))
+        self.write_stats["lots_written"] += len(encoded)
+        self.write_stats["write_ms"] += (time.perf_counter() - start) * 1000
+        return len(encoded)
+
+    @staticmethod
+    def _metadata(lot: dict) -> dict:
+        return {
+            "risk_level": lot["risk_level"],
+            "category": lot.get("category") or "",
+            "text": lot["text"],
+            "objects": str(lot["detected_objects"]),
+        }
+
+    def stats(self) -> dict:
+        """Счётчики записи: объёмы, пропущенные дубликаты, суммарное время кодирования и записи."""
+        stats = dict(self.write_stats)
+        stats["encode_ms"] = round(stats["encode_ms"], 1)
+        stats["write_ms"] = round(stats["write_ms"], 1)
+        stats["avg_batch"] = round(stats["lots_written"] / stats["calls"], 1) if stats["calls"] else 0.0
+        return stats
+
+    def query_similar(self, query_text: str, top_k=2, risk_levels=None, category: str = None):
+        return self.query_similar_batch(
+            [query_text], top_k=top_k, risk_levels=risk_levels,
+            categories=[category] if category else None
+        )[0]
+
+    def query_similar_batch(self, query_texts: list, top_k=2, risk_levels=None, categories: list = None,
+                            pending: list = None, visible: list = None):
+        """
+        Поиск похожих случаев сразу для нескольких запросов.
+        risk_levels — искать только среди кейсов с этими уровнями риска;
+        categories — категория для каждого запроса (None — любая). Фильтр
+        Chroma общий для всего запроса, поэтому запросы группируются по категории:
+        один collection.query на группу.
+        Кейсы, записанные без категории, под фильтр по категории не попадают.
+
+        pending — ещё не записанные записи encode_lots, visible — сколько первых
+        из них видит каждый запрос: они ранжируются вместе с результатами Chroma,
+        как если бы были записаны до этого запроса.
+        """
+        if not query_texts:
+            return []
+        query_embs = np.asarray(self.encoder.encode_texts(query_texts), dtype=np.float32)
+        groups = {}
+        for i, category in enumerate(categories or [None] * len(query_texts)):
+            groups.setdefault(category, []).append(i)
+
+        hits = [None] * len(query_texts)
+        for category, indices in groups.items():
+            with METRICS.span("chroma.query"):
+                results = self.collection.query(
+                    query_embeddings=query_embs[indices].tolist(),
+                    n_results=top_k,
+                    where=make_where(risk_levels, category),
+                    include=["documents", "metadatas", "distances"]
+                )
+            for i, docs, metas, distances in zip(
+                indices, results["documents"], results["metadatas"], results["distances"]
+            ):
+                hits[i] = list(zip(distances, docs, metas))
+
+        if pending:
+            # Косинусное расстояние, как в коллекции (hnsw:space = cosine)
+            pending_embs = np.stack([entry["embedding"] for entry in pending])
+            pending_embs /= np.maximum(np.linalg.norm(pending_embs, axis=1, keepdims=True), 1e-12)
+            queries = query_embs / np.maximum(np.linalg.norm(query_embs, axis=1, keepdims=True), 1e-12)
+            distances = 1.0 - queries @ pending_embs.T
+            metas = [self._metadata(entry["lot"]) for entry in pending]
+            for i, category in enumerate(categories or [None] * len(query_texts)):
+                for j in range(visible[i]):
+                    meta = metas[j]
+                    if risk_levels and meta["risk_level"] not in risk_levels:
+                        continue
+                    if category and meta["category"] != category:
+                        continue
+                    hits[i].append((float(distances[i, j]), pending[j]["document"], meta))
+                hits[i] = sorted(hits[i], key=lambda hit: hit[0])[:top_k]
+
+        return [
+            self._to_cases([doc for _, doc, _ in found], [meta for _, _, meta in found])
+            for found in hits
+        ]
+
+    @staticmethod
+    def _to_cases(documents: list, metadatas: list) -> list:
         cases = []
-        for i, doc in enumerate(results["documents"][0]):
-            meta = results["metadatas"][0][i]
+        for i, doc in enumerate(documents):
+            meta = metadatas[i]
             cases.append({
                 "description": doc,
                 "risk_level": meta["risk_level"],
                 "recommendation": "Проверьте историю продавца" if meta["risk_level"] != "низкий" else "Лот безопасен"
             })
-        return cases
\ No newline at end of file
+        return cases
@@ -0,0 +1,183 @@
+# app/modules/worker_pool.py
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from .analyzer import LotAnalyzer
+from .metrics import METRICS
+from .startup import PROFILER
+
+# Анализатор воркер-процесса: создаётся один раз в инициализаторе
+_worker_analyzer = None
+
+
+def _init_worker(backend, torch_threads: int):
+    """Инициализатор воркера: ограничение потоков torch и однократная загрузка моделей."""
+    global _worker_analyzer
+    if torch_threads:
+        # До первого импорта torch — иначе OpenMP уже выбрал число потоков
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+        import torch
+        torch.set_num_threads(torch_threads)
+        torch.set_num_interop_threads(1)
+    _worker_analyzer = LotAnalyzer(backend=backend, zero_shot=False, image_index=False)
+    # Векторная база воркеру не нужна — грузим только модели
+    _worker_analyzer.yolo
+    _worker_analyzer.ai_detector
+    _worker_analyzer.encoder
+
+
+def _worker_ready(hold_s: float) -> int:
+    # Задержка, чтобы параллельные вызовы разошлись по разным воркерам
+    time.sleep(hold_s)
+    return os.getpid()
+
+
+def _worker_infer(shm_name: str, specs: list, texts: list):
+    """
+    Модельные стадии в воркере. Изображения читаются из общей памяти:
+    specs — список (смещение, высота, ширина) RGB-массивов uint8.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name) if specs else None
+    try:
+        images = []
+        for offset, height, width in specs:
+            view = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf, offset=offset)
+            # Копия в память воркера: после возврата блок будет освобождён родителем
+            images.append(Image.fromarray(view.copy()))
+            del view
+    finally:
+        if shm is not None:
+            shm.close()
+
+    with _worker_analyzer.encoder.request_scope():
+        image_entries, text_entries, _, timings = _worker_analyzer.infer(images, texts)
+    return image_entries, text_entries, timings
+
+
+def _split(items: list, parts: int) -> list:
+    size, rest = divmod(len(items), parts)
+    chunks, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+class ProcessLotAnalyzer(LotAnalyzer):
+    """
+    LotAnalyzer, модельные стадии которого выполняются в пуле процессов.
+    Каждый воркер один раз загружает YOLO, AI-детектор и CLIP; пакет
+    делится между воркерами, изображения передаются через общую память,
+    а не сериализацией PIL.Image. Кэш, правила и векторная база остаются
+    в родительском процессе. Сырые результаты ultralytics между процессами
+    не передаются: рамки приходят в компактных detections.
+
+    torch_threads — потоков torch на воркер; по умолчанию ядра делятся поровну,
+    чтобы воркеры не конкурировали за одни и те же ядра.
+    """
+
+    def __init__(self, workers: int = None, torch_threads: int = None, backend="torch", **kwargs):
+        if kwargs.get("cascade"):
+            # Каскад запускает стадии по одной в этом процессе, мимо пула
+            raise ValueError("cascade mode is not supported with model worker processes")
+        super().__init__(backend=backend, **kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.backends, self.torch_threads),
+        )
+        self._workers_ready = False
+
+    def start(self, hold_s: float = 0.5) -> list:
+        """Дожидается запуска и загрузки моделей во всех воркерах. Возвращает их pid."""
+        futures = [self._pool.submit(_worker_ready, hold_s) for _ in range(self.workers)]
+        pids = sorted({future.result() for future in futures})
+        self._workers_ready = True
+        return pids
+
+    def warm_up(self):
+        # В родителе нужны только CLIP (документы и запросы векторной базы) и сама база
+        with PROFILER.timed("warmup:workers"):
+            self.start()
+        with PROFILER.timed("warmup:clip"):
+            self.encoder.encode_text("прогрев")
+        with PROFILER.timed("warmup:vector_db"):
+            self.vector_db.collection.count()
+        with PROFILER.timed("warmup:zero_shot"):
+            self.zero_shot
+        with PROFILER.timed("warmup:image_index"):
+            self.image_index
+
+    def loaded_components(self) -> dict:
+        components = {
+            name: component.loaded for name, component in self._components.items()
+            if name not in ("yolo", "ai_detector")
+        }
+        components["workers"] = self._workers_ready
+        return components
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def infer(self, images: list, texts: list):
+        if not images and not texts:
+            return [], [], [], {"models": 0.0}
+        start = time.perf_counter()
+        parts = max(1, min(self.workers, max(len(images), len(texts))))
+        image_chunks, text_chunks = _split(images, parts), _split(texts, parts)
+
+        blocks, futures = [], []
+        try:
+            for chunk_images, chunk_texts in zip(image_chunks, text_chunks):
+                shm_name, specs = None, []
+                if chunk_images:
+                    shm, specs = self._to_shared_memory(chunk_images)
+                    blocks.append(shm)
+                    shm_name = shm.name
+                futures.append(self._pool.submit(_worker_infer, shm_name, specs, chunk_texts))
+
+            image_entries, text_entries, stage_timings = [], [], []
+            for future in futures:
+                chunk_image_entries, chunk_text_entries, timings = future.result()
+                image_entries += chunk_image_entries
+                text_entries += chunk_text_entries
+                stage_timings.append(timings)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        # Воркеры работают параллельно: время стадии — максимум по воркерам
+        timings = {
+            name: max(t.get(name, 0.0) for t in stage_timings)
+            for name in set().union(*stage_timings)
+        }
+        timings["models"] = round((time.perf_counter() - start) * 1000, 1)
+        METRICS.observe("worker_pool.parts", parts)
+        return image_entries, text_entries, [None] * len(images), timings
+
+    @staticmethod
+    def _to_shared_memory(images: list):
+        """Копирует RGB-пиксели изображений в один блок общей памяти."""
+        arrays = [np.asarray(image.convert("RGB") if image.mode != "RGB" else image) for image in images]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays)))
+        specs, offset = [], 0
+        for array in arrays:
+            target = np.ndarray(array.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+            target[:] = array
+            del target
+            specs.append((offset, array.shape[0], array.shape[1]))
+            offset += array.nbytes
+        return shm, specs
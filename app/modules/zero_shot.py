@@ -0,0 +1,121 @@
+# app/modules/zero_shot.py
+#
+# Zero-shot категоризация лота по таксономии (config/taxonomy.json).
+# Эмбеддинги текстов меток считаются CLIP один раз и хранятся в .npy,
+# который открывается через mmap: таксономия в десятки тысяч меток
+# не копируется в память каждого процесса. Классификация пакета —
+# одно матричное умножение с уже посчитанными эмбеддингами лотов.
+# Метки с категорией по умолчанию из правил («другое») — фоновые: товар вне
+# категорий правил находит свою метку, а не ближайшую из категорий.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .backends import MODEL_DIR
+from .startup import PROFILER
+
+TAXONOMY_PATH = os.getenv(
+    "LOT_TAXONOMY", os.path.join(os.path.dirname(__file__), "..", "config", "taxonomy.json")
+)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def label_index_path(model_name: str, prompts: list, index_dir: str = MODEL_DIR) -> str:
+    """Файл индекса зависит от модели и текстов меток — смена таксономии пересобирает его."""
+    digest = hashlib.sha1("\n".join([model_name] + prompts).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(index_dir, f"labels-{digest}.npy")
+
+
+def build_label_index(encoder, prompts: list, path: str, chunk_size: int = 1024):
+    """Кодирует тексты меток порциями и сохраняет нормированную матрицу float32."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    matrix = np.lib.format.open_memmap(
+        path + ".tmp", mode="w+", dtype=np.float32,
+        shape=(len(prompts), encoder.model.get_sentence_embedding_dimension())
+    )
+    for start in range(0, len(prompts), chunk_size):
+        chunk = encoder.encode_texts(prompts[start:start + chunk_size])
+        matrix[start:start + len(chunk)] = _normalize(np.asarray(chunk, dtype=np.float32))
+    matrix.flush()
+    del matrix
+    os.replace(path + ".tmp", path)
+
+
+class ZeroShotClassifier:
+    """
+    labels — записи таксономии {"label", "category"}, matrix — их нормированные
+    эмбеддинги (k x d, обычно np.memmap). Оценка метки — взвешенное косинусное
+    сходство с эмбеддингами изображения и описания. Порог — свой для каждой
+    модальности: сходство текст-текст у CLIP заметно выше, чем фото-текст, даже
+    для несвязанных фраз, поэтому общий порог для описания почти ничего не отсекал.
+    При смешивании порог смешивается с теми же весами.
+    """
+
+    def __init__(self, labels: list, matrix: np.ndarray, min_image_score: float = 0.22,
+                 min_text_score: float = 0.8, image_weight: float = 0.5):
+        if len(labels) != matrix.shape[0]:
+            raise ValueError(f"{len(labels)} labels but label matrix has {matrix.shape[0]} rows")
+        self.labels = labels
+        self.matrix = matrix
+        self.min_image_score = min_image_score
+        self.min_text_score = min_text_score
+        # Вес фото по умолчанию; для категории под проверку запрещённых объектов
+        # анализатор передаёт image_weight=0 — иначе фото определяло бы
+        # категорию, по которой само же и проверяется
+        self.image_weight = image_weight
+
+    @classmethod
+    def load(cls, encoder, taxonomy_path: str = TAXONOMY_PATH, index_dir: str = MODEL_DIR):
+        """Читает таксономию и открывает индекс меток, при необходимости собирая его."""
+        with open(taxonomy_path, "r", encoding="utf-8") as f:
+            taxonomy = json.load(f)
+        labels = taxonomy["labels"]
+        template = taxonomy.get("prompt_template", "{}")
+        prompts = [template.format(entry.get("prompt", entry["label"])) for entry in labels]
+
+        path = label_index_path(encoder.model_name, prompts, index_dir)
+        if not os.path.exists(path):
+            print(f"Построение индекса меток ({len(prompts)})...")
+            with PROFILER.timed("build:label_index"):
+                build_label_index(encoder, prompts, path)
+        return cls(
+            labels, np.load(path, mmap_mode="r"),
+            min_image_score=taxonomy.get("min_image_score", 0.22),
+            min_text_score=taxonomy.get("min_text_score", 0.8),
+            image_weight=taxonomy.get("image_weight", 0.5),
+        )
+
+    def classify(self, image_embeddings, text_embeddings, image_weight: float = None) -> list:
+        """
+        Лучшая метка для каждого лота: {"label", "category", "score"} или None,
+        если сходство ниже порога. image_weight переопределяет вес фото;
+        при image_weight=0 image_embeddings не нужны (можно None).
+        """
+        weight = self.image_weight if image_weight is None else image_weight
+        texts = _normalize(np.asarray(text_embeddings, dtype=np.float32))
+        if not len(texts):
+            return []
+        # Линейность: w·(I·L) + (1-w)·(T·L) = (w·I + (1-w)·T)·L — одно умножение
+        queries = (1 - weight) * texts
+        if weight:
+            queries = queries + weight * _normalize(np.asarray(image_embeddings, dtype=np.float32))
+        min_score = weight * self.min_image_score + (1 - weight) * self.min_text_score
+        scores = queries @ self.matrix.T
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        return [
+            {
+                "label": self.labels[j]["label"],
+                "category": self.labels[j]["category"],
+                "score": round(float(score), 3),
+            }
+            if score >= min_score else None
+            for j, score in zip(best.tolist(), best_scores.tolist())
+        ]
@@ -0,0 +1,185 @@
+# app/service.py
+#
+# HTTP/JSON-сервис анализа лотов с динамическим микробатчингом.
+# Запуск (из каталога app/):
+#   python service.py --port 8080 --max-batch-size 16 --max-wait-ms 5
+#
+# POST /analyze   {"text": "...", "image_b64": "<base64>", "lot_id": "...", "report": false}
+#                 с Accept: application/octet-stream ответ — LotResult.to_bytes()
+# POST /report    {"analysis": {...}, "text": "..."}
+# GET  /health    готовность моделей и глубина очереди
+# GET  /metrics   метрики в формате Prometheus
+#
+# Одновременные запросы /analyze собираются в пакеты (до --max-batch-size лотов
+# или --max-wait-ms миллисекунд) и уходят в LotAnalyzer.analyze_lots одним вызовом.
+# Переполненная очередь отвечает 503, истёкший таймаут запроса — 504.
+# С --model-workers N модели работают в N процессах (modules/worker_pool.py).
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from PIL import Image
+
+from modules.analyzer import LotAnalyzer
+from modules.backends import BACKENDS
+from modules.batching import MicroBatcher, QueueFullError
+from modules.metrics import METRICS
+from modules.preprocess import load_image
+from modules.rag_llm import RAGLLM
+from modules.result_cache import ResultCache, lot_fingerprint
+from modules.startup import warm_up
+from modules.worker_pool import ProcessLotAnalyzer
+
+logger = logging.getLogger("service")
+
+
+def _decode_image(image_b64: str) -> Image.Image:
+    return load_image(base64.b64decode(image_b64))
+
+
+class LotService:
+    def __init__(self, analyzer: LotAnalyzer, rag_llm: RAGLLM, max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, max_queue: int = 256, request_timeout: float = 30.0,
+                 decode_workers: int = 4, batch_workers: int = 1):
+        self.analyzer = analyzer
+        self.rag_llm = rag_llm
+        self.request_timeout = request_timeout
+        self.batcher = MicroBatcher(
+            self._analyze_batch, max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms, max_queue=max_queue, workers=batch_workers
+        )
+        # Декодирование изображений и генерация отчётов не должны блокировать event loop
+        self._decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+        self._llm_pool = ThreadPoolExecutor(max_workers=rag_llm.max_concurrency, thread_name_prefix="llm")
+
+    def _analyze_batch(self, items: list) -> list:
+        return self.analyzer.analyze_lots(items)
+
+    async def on_startup(self, app):
+        await self.batcher.start()
+
+    async def on_cleanup(self, app):
+        await self.batcher.stop()
+        self._decode_pool.shutdown(wait=False)
+        self._llm_pool.shutdown(wait=False)
+
+    async def analyze(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            text = body["text"]
+            image_b64 = body["image_b64"]
+        except (ValueError, KeyError) as e:
+            raise web.HTTPBadRequest(text=f"expected JSON with text and image_b64: {e}")
+
+        loop = asyncio.get_running_loop()
+        try:
+            image = await loop.run_in_executor(self._decode_pool, _decode_image, image_b64)
+        except Exception as e:
+            raise web.HTTPBadRequest(text=f"cannot decode image: {e}")
+        lot_id = body.get("lot_id") or f"api_{lot_fingerprint(image, text)}"
+
+        try:
+            result = await self.batcher.submit((image, text, lot_id), timeout=self.request_timeout)
+        except QueueFullError as e:
+            raise web.HTTPServiceUnavailable(text=str(e), headers={"Retry-After": "1"})
+        except asyncio.TimeoutError:
+            raise web.HTTPGatewayTimeout(text=f"analysis did not finish in {self.request_timeout} s")
+
+        if body.get("report"):
+            return web.json_response(dict(result.to_dict(), report=await self._report(result, text)))
+        # Компактная бинарная форма LotResult (см. modules/result.py) по Accept
+        if "application/octet-stream" in request.headers.get("Accept", ""):
+            return web.Response(body=result.to_bytes(), content_type="application/octet-stream")
+        return web.json_response(result.to_dict())
+
+    async def report(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            analysis, text = body["analysis"], body["text"]
+        except (ValueError, KeyError) as e:
+            raise web.HTTPBadRequest(text=f"expected JSON with analysis and text: {e}")
+        return web.json_response({"report": await self._report(analysis, text)})
+
+    async def _report(self, analysis: dict, text: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._llm_pool, self.rag_llm.generate_report, analysis, text)
+
+    async def health(self, request: web.Request) -> web.Response:
+        components = self.analyzer.loaded_components()
+        return web.json_response(
+            {"ready": all(components.values()), "components": components,
+             "queue_depth": self.batcher.queue_depth,
+             # Лоты каскада в очереди фонового дообогащения
+             "enrich_pending": self.analyzer.cascade_stats["pending"]},
+            status=200 if all(components.values()) else 503
+        )
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        METRICS.inc("service.scrapes")
+        return web.Response(text=METRICS.to_prometheus(), content_type="text/plain")
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 2**20)
+        app.router.add_post("/analyze", self.analyze)
+        app.router.add_post("/report", self.report)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/metrics", self.metrics)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP inference service with dynamic micro-batching")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=256, help="больше — 503")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="секунд, больше — 504")
+    parser.add_argument("--persist-dir", default="./data/chroma_db")
+    parser.add_argument("--backend", default=os.getenv("LOT_BACKEND", "torch"), choices=BACKENDS)
+    parser.add_argument("--parallel-stages", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--model-workers", type=int, default=0,
+                        help="процессов с моделями (0 — инференс в процессе сервиса)")
+    parser.add_argument("--torch-threads", type=int, help="потоков torch на процесс-воркер")
+    parser.add_argument("--cascade", action="store_true",
+                        help="каскад стадий: лоты с однозначно высоким риском не проходят оставшиеся модели")
+    args = parser.parse_args()
+    if args.cascade and args.model_workers:
+        parser.error("--cascade is not supported with --model-workers")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.model_workers:
+        analyzer = ProcessLotAnalyzer(
+            workers=args.model_workers, torch_threads=args.torch_threads,
+            persist_dir=args.persist_dir, backend=args.backend, cascade=args.cascade
+        )
+    else:
+        analyzer = LotAnalyzer(
+            persist_dir=args.persist_dir, parallel_stages=args.parallel_stages, backend=args.backend,
+            cascade=args.cascade
+        )
+    if not args.no_cache:
+        analyzer.result_cache = ResultCache(model_version=analyzer.model_version)
+    rag_llm = RAGLLM(report_cache_path="./data/cache/reports.sqlite3")
+    # /health отвечает 503, пока модели грузятся и прогреваются
+    warm_up(analyzer, background=True)
+
+    # С пулом процессов пакеты обрабатываются параллельно: по одному на воркер
+    service = LotService(
+        analyzer, rag_llm, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue, request_timeout=args.request_timeout,
+        batch_workers=max(1, args.model_workers)
+    )
+    web.run_app(service.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
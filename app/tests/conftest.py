@@ -0,0 +1,9 @@
+# app/tests/conftest.py
+#
+# Тесты запускаются из каталога app/ (python -m pytest tests), как и бенчмарки:
+# modules и benchmarks импортируются как пакеты верхнего уровня.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
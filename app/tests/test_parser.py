@@ -0,0 +1,118 @@
+# app/tests/test_parser.py
+#
+# DriverPool без браузера: фабрика выдаёт заглушки драйверов. Выбраковка
+# драйверов при конкуренции за пул, таймаут ожидания, сохранение HTML для отладки.
+
+import threading
+import time
+
+import pytest
+
+from modules import parser
+from modules.parser import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, url: str = "https://www.wildberries.ru/catalog/1/detail.aspx"):
+        self.current_url = url
+        self.page_source = "<html></html>"
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+    def __init__(self):
+        self.created = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        driver = FakeDriver()
+        with self._lock:
+            self.created.append(driver)
+        return driver
+
+
+def test_waiters_get_drivers_after_discards():
+    factory = Factory()
+    pool = DriverPool(size=2, factory=factory, acquire_timeout=5)
+    in_use, peak, lock = set(), [0], threading.Lock()
+    served = []
+
+    def task(i):
+        try:
+            with pool.driver() as driver:
+                with lock:
+                    in_use.add(id(driver))
+                    peak[0] = max(peak[0], len(in_use))
+                time.sleep(0.02)
+                with lock:
+                    in_use.discard(id(driver))
+                if i % 2 == 0:
+                    # Ошибка браузера: драйвер выбраковывается
+                    raise OSError("browser crashed")
+        except OSError:
+            return
+        served.append(i)
+
+    # Потоков больше, чем драйверов: остальные ждут слот, пока драйверы выбраковываются
+    threads = [threading.Thread(target=task, args=(i,), daemon=True) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(served) == list(range(1, 12, 2))
+    assert peak[0] <= 2
+    # Каждый выбракованный драйвер закрыт и заменён новым
+    assert sum(driver.quit_called for driver in factory.created) == 6
+    assert len(factory.created) - 6 <= 2
+    pool.close()
+    assert all(driver.quit_called for driver in factory.created)
+
+
+def test_parse_error_keeps_driver():
+    factory = Factory()
+    pool = DriverPool(size=1, factory=factory)
+
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            raise RuntimeError("no title")
+    with pool.driver() as driver:
+        assert driver is factory.created[0]
+    assert len(factory.created) == 1
+    assert not factory.created[0].quit_called
+
+
+def test_acquire_timeout_raises():
+    pool = DriverPool(size=1, factory=Factory(), acquire_timeout=0.1)
+
+    with pool.driver():
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            with pool.driver():
+                pass
+        assert time.perf_counter() - start < 2
+    # Слот освободился — драйвер снова выдаётся
+    with pool.driver():
+        pass
+
+
+def test_debug_page_saved_per_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, "DEBUG_DIR", str(tmp_path))
+
+    parser._dump_debug_page(FakeDriver("https://www.ozon.ru/product/1"), "ozon")
+    parser._dump_debug_page(FakeDriver("https://www.ozon.ru/product/2"), "ozon")
+
+    assert len(list(tmp_path.glob("ozon_*.html"))) == 2
+
+
+def test_debug_page_failure_does_not_raise(tmp_path, monkeypatch):
+    # Каталог для отладки недоступен (файл вместо каталога): ошибка только логируется
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    monkeypatch.setattr(parser, "DEBUG_DIR", str(blocker))
+
+    parser._dump_debug_page(FakeDriver(), "wildberries")
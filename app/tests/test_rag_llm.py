@@ -0,0 +1,113 @@
+# app/tests/test_rag_llm.py
+#
+# RAGLLM против локальной заглушки Ollama (benchmarks/stub_ollama.py), без сети:
+# сборка потока в отчёт, замеры TTFT/полного времени, предел одновременных
+# генераций и ошибки сервера (500, обрыв соединения).
+
+import pytest
+
+from benchmarks.stub_ollama import start_stub_server
+from modules.rag_llm import RAGLLM
+
+ANALYSIS = {
+    "lot_id": "lot_1",
+    "detected_objects": ["cell phone"],
+    "similarity_score": 0.31,
+    "ai_detection": {"is_ai_generated": False, "ai_score": 0.12},
+    "risk_level": "средний",
+    "rag_context": [],
+    "duplicate_images": None,
+}
+
+
+def words(count: int) -> str:
+    return "".join(f"слово{i} " for i in range(count))
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        kwargs.setdefault("token_delay_ms", 1.0)
+        kwargs.setdefault("first_token_delay_ms", 5.0)
+        server, url = start_stub_server(**kwargs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_llm(url: str, **kwargs) -> RAGLLM:
+    # Шаблонные отчёты отключены: каждый отчёт идёт в LLM
+    return RAGLLM(ollama_url=url, template_risk_levels=(), **kwargs)
+
+
+def test_stream_chunks_join_into_report(stub):
+    _, url = stub(tokens=16)
+    llm = make_llm(url)
+
+    chunks = list(llm.stream_report(ANALYSIS, "Телефон"))
+
+    assert len(chunks) == 16
+    assert "".join(chunks) == words(16)
+    assert llm.generate_report(ANALYSIS, "Телефон") == words(16)
+
+
+def test_metrics_record_ttft_and_total(stub):
+    _, url = stub(tokens=10, token_delay_ms=10.0, first_token_delay_ms=100.0)
+    llm = make_llm(url)
+    metrics = {}
+
+    llm.generate_report(ANALYSIS, "Телефон", metrics=metrics)
+
+    assert metrics["source"] == "llm"
+    assert metrics["ttft_ms"] >= 100
+    # Остальные 9 токенов приходят после первого с задержкой 10 мс
+    assert metrics["total_ms"] >= metrics["ttft_ms"] + 80
+    stats = llm.latency_stats()
+    assert stats["reports"] == 1
+    assert stats["ttft_p50_ms"] == metrics["ttft_ms"]
+    assert stats["sources"] == {"llm": 1}
+
+
+def test_concurrency_limited_by_semaphore(stub):
+    server, url = stub(tokens=5, token_delay_ms=20.0)
+    llm = make_llm(url, max_concurrency=2)
+
+    # Потоков больше, чем слотов: лишние ждут семафор, а не Ollama
+    reports = llm.generate_reports([(ANALYSIS, f"Лот {i}") for i in range(6)], max_workers=6)
+
+    assert reports == [words(5)] * 6
+    assert server.max_active == 2
+
+
+def test_server_error_is_reported(stub, tmp_path):
+    _, url = stub(status=500)
+    llm = make_llm(url, report_cache_path=str(tmp_path / "reports.sqlite3"))
+
+    report = llm.generate_report(ANALYSIS, "Телефон")
+
+    assert report.startswith("Ошибка генерации отчёта:")
+    assert "stub error 500" in report
+    assert llm.latency_stats()["reports"] == 0
+    # Ошибка не кэшируется: повторный запрос снова идёт к серверу
+    assert llm.generate_report(ANALYSIS, "Телефон").startswith("Ошибка генерации отчёта:")
+    assert llm.report_sources["cache"] == 0
+
+
+def test_dropped_connection_is_reported(stub, tmp_path):
+    _, url = stub(tokens=10, drop_after=3)
+    llm = make_llm(url, report_cache_path=str(tmp_path / "reports.sqlite3"))
+
+    report = llm.generate_report(ANALYSIS, "Телефон")
+
+    assert report.startswith(words(3))
+    assert "Не удалось подключиться к LLM" in report
+    assert llm.latency_stats()["reports"] == 0
+    # Оборванный отчёт не попадает в кэш
+    assert "Не удалось подключиться к LLM" in llm.generate_report(ANALYSIS, "Телефон")
+    assert llm.report_sources["cache"] == 0